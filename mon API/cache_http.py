@@ -0,0 +1,65 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+# En-tête Cache-Control des réponses en lecture. Par défaut, le client garde la réponse
+# mais la revalide à chaque fois (If-None-Match) : 304 sans corps si rien n'a changé.
+CACHE_CONTROL = os.environ.get("MANGA_API_CACHE_CONTROL", "no-cache")
+
+
+# Fonction pour construire un ETag à partir d'un numéro de version
+def etiquette(version):
+    return f'W/"{version}"'
+
+
+# Fonction pour construire un ETag à partir du contenu encodé d'un élément
+def etiquette_contenu(octets):
+    return f'"{hashlib.blake2b(octets, digest_size=8).hexdigest()}"'
+
+
+def _correspond(if_none_match, etag):
+    if if_none_match.strip() == "*":
+        return True
+    # Comparaison faible : W/"x" et "x" désignent la même version
+    attendu = etag.removeprefix("W/")
+    return any(valeur.strip().removeprefix("W/") == attendu for valeur in if_none_match.split(","))
+
+
+def non_modifie(request: Request, etag, modifie_le=None, prive=False):
+    """
+    Retourne une réponse 304 si le client possède déjà cette version (If-None-Match,
+    ou à défaut If-Modified-Since), sinon None.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        est_a_jour = _correspond(if_none_match, etag)
+    elif modifie_le is not None and "if-modified-since" in request.headers:
+        try:
+            depuis = parsedate_to_datetime(request.headers["if-modified-since"])
+        except (TypeError, ValueError):
+            return None
+        # Les dates HTTP sont à la seconde près
+        est_a_jour = int(modifie_le) <= depuis.timestamp()
+    else:
+        return None
+    if not est_a_jour:
+        return None
+    reponse = Response(status_code=304)
+    definir_entetes_cache(reponse, etag, modifie_le, prive)
+    return reponse
+
+
+def definir_entetes_cache(response: Response, etag, modifie_le=None, prive=False):
+    """
+    Ajoute ETag, Last-Modified et Cache-Control à une réponse
+    (prive=True pour les réponses soumises à authentification)
+    """
+    response.headers["ETag"] = etag
+    if modifie_le is not None:
+        response.headers["Last-Modified"] = format_datetime(
+            datetime.fromtimestamp(int(modifie_le), tz=timezone.utc), usegmt=True
+        )
+    response.headers["Cache-Control"] = f"private, {CACHE_CONTROL}" if prive else CACHE_CONTROL
@@ -0,0 +1,195 @@
+import bisect
+import math
+import threading
+from itertools import islice
+
+# Nombre d'éléments d'un seau d'une liste triée (un seau est découpé au double)
+TAILLE_SEAU = 512
+
+
+class ListeTriee:
+    """
+    Liste triée découpée en seaux (petites listes triées) : insertion, suppression et rang
+    en O(log n) sans déplacer toute la liste. Le nombre d'éléments des seaux précédents,
+    nécessaire au calcul du rang, est tenu dans un arbre de Fenwick.
+    """
+
+    def __init__(self, taille_seau=TAILLE_SEAU):
+        self.taille_seau = taille_seau
+        self._seaux = []
+        # Plus grande valeur de chaque seau, pour trouver le seau d'une valeur par dichotomie
+        self._maximums = []
+        self._fenwick = []
+        self._taille = 0
+
+    def __len__(self):
+        return self._taille
+
+    def _reconstruire_fenwick(self):
+        # Appelé seulement quand le nombre de seaux change (découpage ou seau vidé)
+        fenwick = [len(seau) for seau in self._seaux]
+        for i in range(len(fenwick)):
+            parent = i | (i + 1)
+            if parent < len(fenwick):
+                fenwick[parent] += fenwick[i]
+        self._fenwick = fenwick
+
+    def _fenwick_ajouter(self, indice, delta):
+        while indice < len(self._fenwick):
+            self._fenwick[indice] += delta
+            indice |= indice + 1
+
+    def _fenwick_prefixe(self, indice):
+        # Nombre d'éléments dans les seaux d'indice < indice
+        total = 0
+        while indice > 0:
+            total += self._fenwick[indice - 1]
+            indice &= indice - 1
+        return total
+
+    def ajouter(self, valeur):
+        self._taille += 1
+        if not self._seaux:
+            self._seaux.append([valeur])
+            self._maximums.append(valeur)
+            self._reconstruire_fenwick()
+            return
+        i = min(bisect.bisect_left(self._maximums, valeur), len(self._seaux) - 1)
+        seau = self._seaux[i]
+        bisect.insort(seau, valeur)
+        self._maximums[i] = seau[-1]
+        if len(seau) <= 2 * self.taille_seau:
+            self._fenwick_ajouter(i, 1)
+            return
+        # Seau trop grand : le couper en deux
+        moitie = len(seau) // 2
+        self._seaux[i:i + 1] = [seau[:moitie], seau[moitie:]]
+        self._maximums[i:i + 1] = [seau[moitie - 1], seau[-1]]
+        self._reconstruire_fenwick()
+
+    def retirer(self, valeur):
+        """
+        Retire la valeur, retourne False si elle n'est pas présente
+        """
+        i = bisect.bisect_left(self._maximums, valeur)
+        if i == len(self._seaux):
+            return False
+        seau = self._seaux[i]
+        j = bisect.bisect_left(seau, valeur)
+        if j == len(seau) or seau[j] != valeur:
+            return False
+        del seau[j]
+        self._taille -= 1
+        if seau:
+            self._maximums[i] = seau[-1]
+            self._fenwick_ajouter(i, -1)
+        else:
+            del self._seaux[i]
+            del self._maximums[i]
+            self._reconstruire_fenwick()
+        return True
+
+    def rang(self, valeur):
+        """
+        Nombre d'éléments strictement inférieurs à la valeur
+        """
+        i = bisect.bisect_left(self._maximums, valeur)
+        if i == len(self._seaux):
+            return self._taille
+        return self._fenwick_prefixe(i) + bisect.bisect_left(self._seaux[i], valeur)
+
+    def premiers(self, nombre):
+        """
+        Les nombre plus petits éléments, dans l'ordre
+        """
+        return list(islice((valeur for seau in self._seaux for valeur in seau), nombre))
+
+
+def _groupes(equipe, position):
+    # Classements dont fait partie un score : général, équipe, position, équipe et position
+    return (("tous",), ("equipe", equipe), ("position", position), ("equipe_position", equipe, position))
+
+
+def _groupe_filtre(equipe=None, position=None):
+    if equipe is not None and position is not None:
+        return ("equipe_position", equipe, position)
+    if equipe is not None:
+        return ("equipe", equipe)
+    if position is not None:
+        return ("position", position)
+    return ("tous",)
+
+
+class Classements:
+    """
+    Classements des scores par score_global décroissant (à égalité, par personnage_id) :
+    général, par équipe, par position et par équipe et position.
+    Tenus à jour à chaque modification des scores ; les scores sans score_global numérique
+    fini (absent, infini ou NaN) ne sont pas classés.
+    """
+
+    def __init__(self):
+        # Groupe -> ListeTriee de (-score_global, personnage_id)
+        self._listes = {}
+        # personnage_id -> (valeur triée, equipe, position)
+        self._entrees = {}
+        self._verrou = threading.Lock()
+
+    # Abonnement au dépôt des scores
+    def score_modifie(self, ancien, nouveau):
+        with self._verrou:
+            if ancien is not None:
+                entree = self._entrees.pop(ancien.get("personnage_id"), None)
+                if entree is not None:
+                    valeur, equipe, position = entree
+                    for groupe in _groupes(equipe, position):
+                        liste = self._listes[groupe]
+                        liste.retirer(valeur)
+                        if not liste:
+                            del self._listes[groupe]
+            if nouveau is None:
+                return
+            score_global = nouveau.get("score_global")
+            if not isinstance(score_global, (int, float)) or isinstance(score_global, bool):
+                return
+            # NaN casserait l'ordre de la liste triée (comparaisons toujours fausses)
+            try:
+                if not math.isfinite(score_global):
+                    return
+            except OverflowError:  # entier trop grand pour un float
+                return
+            personnage_id = nouveau.get("personnage_id")
+            valeur = (-score_global, personnage_id)
+            equipe, position = nouveau.get("equipe"), nouveau.get("position")
+            self._entrees[personnage_id] = (valeur, equipe, position)
+            for groupe in _groupes(equipe, position):
+                liste = self._listes.get(groupe)
+                if liste is None:
+                    liste = self._listes[groupe] = ListeTriee()
+                liste.ajouter(valeur)
+
+    def meilleurs(self, nombre, equipe=None, position=None):
+        """
+        Retourne (personnage_id des nombre meilleurs scores, nombre de scores classés)
+        """
+        with self._verrou:
+            liste = self._listes.get(_groupe_filtre(equipe, position))
+            if liste is None:
+                return [], 0
+            return [personnage_id for _, personnage_id in liste.premiers(nombre)], len(liste)
+
+    def rang(self, personnage_id):
+        """
+        Rang (à partir de 1) et nombre de scores classés : général, dans l'équipe et dans la position.
+        None si le personnage n'a pas de score classé.
+        """
+        with self._verrou:
+            entree = self._entrees.get(personnage_id)
+            if entree is None:
+                return None
+            valeur, equipe, position = entree
+            resultat = {"score_global": -valeur[0]}
+            for nom, groupe in (("general", ("tous",)), ("equipe", ("equipe", equipe)), ("position", ("position", position))):
+                liste = self._listes[groupe]
+                resultat[nom] = {"rang": liste.rang(valeur) + 1, "total": len(liste)}
+            return resultat
@@ -0,0 +1,326 @@
+import math
+import threading
+
+from statistiques import CHAMPS_COMPETENCES
+
+# NumPy est optionnel : sans lui, les statistiques par colonnes ne sont pas disponibles
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Percentiles calculés quand le client n'en demande pas
+PERCENTILES_DEFAUT = (25, 50, 75, 90)
+CAPACITE_INITIALE = 1024
+# Nombre maximal de cases (groupes x valeurs possibles) d'un histogramme de valeurs entières
+TAILLE_MAX_HISTOGRAMME = 1 << 22
+
+
+class Dictionnaire:
+    """
+    Encodage des valeurs texte (équipes, positions) en codes entiers
+    """
+
+    def __init__(self):
+        self._codes = {}
+        self.valeurs = []
+
+    def code(self, valeur):
+        code = self._codes.get(valeur)
+        if code is None:
+            code = self._codes[valeur] = len(self.valeurs)
+            self.valeurs.append(valeur)
+        return code
+
+
+class TableColonnes:
+    """
+    Colonnes NumPy d'une collection : une ligne par élément, retrouvée par sa clé.
+    Les lignes supprimées sont marquées inactives et réutilisées.
+    Les valeurs absentes sont NaN.
+    """
+
+    def __init__(self, noms_valeurs, capacite=CAPACITE_INITIALE):
+        self.noms_valeurs = noms_valeurs
+        self._lignes = {}
+        self._libres = []
+        self.taille = 0
+        self.actif = np.zeros(capacite, dtype=bool)
+        self.codes = {"equipe": np.zeros(capacite, dtype=np.int32), "position": np.zeros(capacite, dtype=np.int32)}
+        self.valeurs = {nom: np.full(capacite, np.nan) for nom in noms_valeurs}
+
+    def _agrandir(self, capacite):
+        self.actif = np.resize(self.actif, capacite)
+        self.actif[self.taille:] = False
+        for nom, colonne in self.codes.items():
+            self.codes[nom] = np.resize(colonne, capacite)
+        for nom, colonne in self.valeurs.items():
+            self.valeurs[nom] = np.resize(colonne, capacite)
+
+    def ecrire(self, cle, code_equipe, code_position, valeurs):
+        ligne = self._lignes.get(cle)
+        if ligne is None:
+            if self._libres:
+                ligne = self._libres.pop()
+            else:
+                if self.taille == len(self.actif):
+                    self._agrandir(2 * len(self.actif))
+                ligne = self.taille
+                self.taille += 1
+            self._lignes[cle] = ligne
+        self.actif[ligne] = True
+        self.codes["equipe"][ligne] = code_equipe
+        self.codes["position"][ligne] = code_position
+        for nom in self.noms_valeurs:
+            valeur = valeurs.get(nom)
+            self.valeurs[nom][ligne] = np.nan if valeur is None else valeur
+
+    def supprimer(self, cle):
+        ligne = self._lignes.pop(cle, None)
+        if ligne is not None:
+            self.actif[ligne] = False
+            self._libres.append(ligne)
+
+    def charger(self, cles, codes_equipe, codes_position, valeurs):
+        """
+        Remplace tout le contenu en une fois (colonnes déjà construites)
+        """
+        taille = len(cles)
+        self._agrandir(max(taille, CAPACITE_INITIALE))
+        self._lignes = {cle: ligne for ligne, cle in enumerate(cles)}
+        self._libres = []
+        self.taille = taille
+        self.actif[:taille] = True
+        self.actif[taille:] = False
+        self.codes["equipe"][:taille] = codes_equipe
+        self.codes["position"][:taille] = codes_position
+        for nom in self.noms_valeurs:
+            self.valeurs[nom][:taille] = valeurs[nom]
+
+
+def _valeur_numerique(valeur):
+    # Les valeurs infinies ou NaN (acceptées par les modèles) sont ignorées, comme les valeurs absentes
+    if not isinstance(valeur, (int, float)) or isinstance(valeur, bool):
+        return None
+    try:
+        return valeur if math.isfinite(valeur) else None
+    except OverflowError:  # entier trop grand pour un float
+        return None
+
+
+def _rangs_histogramme(codes, valeurs, nombre_groupes):
+    """
+    Pour des valeurs entières sur un petit intervalle (les compétences) : histogramme par groupe
+    (un seul passage, sans tri). Retourne une fonction donnant les valeurs aux rangs demandés
+    dans l'ordre (groupe, valeur), ou None si l'histogramme serait trop grand.
+    """
+    minimum = valeurs.min()
+    etendue = int(valeurs.max() - minimum) + 1
+    if etendue * nombre_groupes > TAILLE_MAX_HISTOGRAMME or not np.array_equal(valeurs, np.floor(valeurs)):
+        return None
+    cases = codes.astype(np.int64) * etendue + (valeurs - minimum).astype(np.int64)
+    cumul = np.cumsum(np.bincount(cases, minlength=nombre_groupes * etendue))
+    return lambda rangs: minimum + np.searchsorted(cumul, rangs, side="right") % etendue
+
+
+def _agreger(codes, valeurs, actif, percentiles):
+    """
+    Statistiques de valeurs regroupées par code, sans boucle Python sur les lignes.
+    Retourne {code: {"nombre", "moyenne", "min", "max", "p<percentile>"...}}
+    """
+    masque = actif & np.isfinite(valeurs)
+    codes = codes[masque]
+    valeurs = valeurs[masque]
+    if len(valeurs) == 0:
+        return {}
+    nombres = np.bincount(codes)
+    sommes = np.bincount(codes, weights=valeurs)
+    # Rang de début de chaque groupe dans l'ordre (groupe, valeur)
+    debuts = np.cumsum(nombres) - nombres
+    valeurs_aux_rangs = _rangs_histogramme(codes, valeurs, len(nombres))
+    if valeurs_aux_rangs is None:
+        # Cas général : tri par groupe puis par valeur
+        triees = valeurs[np.lexsort((valeurs, codes))]
+        valeurs_aux_rangs = triees.__getitem__
+
+    groupes = np.flatnonzero(nombres)
+    nombres = nombres[groupes]
+    debuts = debuts[groupes]
+    fins = debuts + nombres - 1
+    colonnes = {
+        "nombre": nombres,
+        "moyenne": np.round(sommes[groupes] / nombres, 2),
+        "min": valeurs_aux_rangs(debuts),
+        "max": valeurs_aux_rangs(fins),
+    }
+    # Percentiles par interpolation linéaire entre les deux valeurs encadrantes
+    for percentile in percentiles:
+        position = debuts + (nombres - 1) * (percentile / 100)
+        bas = np.floor(position).astype(np.int64)
+        haut = np.minimum(bas + 1, fins)
+        valeur_bas = valeurs_aux_rangs(bas)
+        interpole = valeur_bas + (valeurs_aux_rangs(haut) - valeur_bas) * (position - bas)
+        colonnes[f"p{percentile:g}"] = np.round(interpole, 2)
+
+    listes = {nom: colonne.tolist() for nom, colonne in colonnes.items()}
+    return {
+        code: {nom: liste[i] for nom, liste in listes.items()}
+        for i, code in enumerate(groupes.tolist())
+    }
+
+
+class MoteurColonnes:
+    """
+    Représentation en colonnes NumPy des personnages (compétences) et des scores (score_global),
+    tenue à jour à chaque modification. Équipes et positions sont encodées en entiers :
+    les statistiques par groupe sont calculées de manière vectorisée.
+    """
+
+    def __init__(self):
+        self.dictionnaires = {"equipe": Dictionnaire(), "position": Dictionnaire()}
+        self.personnages = TableColonnes(CHAMPS_COMPETENCES)
+        self.scores = TableColonnes(("score_global",))
+        self._verrou = threading.Lock()
+        # Résultats déjà calculés, vidés à chaque modification
+        self._cache = {}
+
+    def _codes(self, element):
+        return (
+            self.dictionnaires["equipe"].code(element.get("equipe")),
+            self.dictionnaires["position"].code(element.get("position")),
+        )
+
+    # Abonnement au dépôt des personnages
+    def personnage_modifie(self, ancien, nouveau):
+        with self._verrou:
+            self._cache.clear()
+            if nouveau is None:
+                self.personnages.supprimer(ancien.get("id"))
+                return
+            competences = nouveau.get("competences")
+            if not isinstance(competences, dict):
+                competences = {}
+            valeurs = {champ: _valeur_numerique(competences.get(champ)) for champ in CHAMPS_COMPETENCES}
+            self.personnages.ecrire(nouveau.get("id"), *self._codes(nouveau), valeurs)
+
+    # Abonnement au dépôt des scores
+    def score_modifie(self, ancien, nouveau):
+        with self._verrou:
+            self._cache.clear()
+            if nouveau is None:
+                self.scores.supprimer(ancien.get("personnage_id"))
+                return
+            valeurs = {"score_global": _valeur_numerique(nouveau.get("score_global"))}
+            self.scores.ecrire(nouveau.get("personnage_id"), *self._codes(nouveau), valeurs)
+
+    def _charger_table(self, table, lignes):
+        # lignes : [(clé, equipe, position, valeur1, valeur2...)]
+        equipes = self.dictionnaires["equipe"]
+        positions = self.dictionnaires["position"]
+        cles = [ligne[0] for ligne in lignes]
+        codes_equipe = np.fromiter((equipes.code(ligne[1]) for ligne in lignes), dtype=np.int32, count=len(lignes))
+        codes_position = np.fromiter((positions.code(ligne[2]) for ligne in lignes), dtype=np.int32, count=len(lignes))
+        valeurs = {
+            nom: np.array([_valeur_numerique(ligne[3 + i]) for ligne in lignes], dtype=float)
+            for i, nom in enumerate(table.noms_valeurs)
+        }
+        table.charger(cles, codes_equipe, codes_position, valeurs)
+
+    def charger(self, personnages, scores):
+        """
+        Remplace tout le contenu à partir de lignes déjà extraites (ex: requête SQL) :
+        personnages [(id, equipe, position, force, technique, vitesse, endurance)],
+        scores [(personnage_id, equipe, position, score_global)]
+        """
+        with self._verrou:
+            self._cache.clear()
+            self.dictionnaires = {"equipe": Dictionnaire(), "position": Dictionnaire()}
+            self._charger_table(self.personnages, personnages)
+            self._charger_table(self.scores, scores)
+
+    def statistiques(self, champ, percentiles=PERCENTILES_DEFAUT):
+        """
+        Pour chaque valeur du champ ("equipe" ou "position") : nombre de personnages et,
+        pour chaque compétence et pour score_global, nombre, moyenne, min, max et percentiles
+        """
+        cle_cache = (champ, tuple(percentiles))
+        with self._verrou:
+            resultat = self._cache.get(cle_cache)
+            if resultat is not None:
+                return resultat
+
+            valeurs_groupes = self.dictionnaires[champ].valeurs
+            groupes = {}
+
+            def groupe(code):
+                if code not in groupes:
+                    groupes[code] = {"nombre_personnages": 0}
+                return groupes[code]
+
+            table = self.personnages
+            actif = table.actif[:table.taille]
+            codes = table.codes[champ][:table.taille]
+            for code, nombre in enumerate(np.bincount(codes[actif]).tolist()):
+                if nombre:
+                    groupe(code)["nombre_personnages"] = nombre
+            for champ_competence in CHAMPS_COMPETENCES:
+                valeurs = table.valeurs[champ_competence][:table.taille]
+                for code, stats in _agreger(codes, valeurs, actif, percentiles).items():
+                    groupe(code)[champ_competence] = stats
+
+            table = self.scores
+            stats_scores = _agreger(
+                table.codes[champ][:table.taille], table.valeurs["score_global"][:table.taille],
+                table.actif[:table.taille], percentiles
+            )
+            for code, stats in stats_scores.items():
+                groupe(code)["score_global"] = stats
+
+            resultat = {valeurs_groupes[code]: stats for code, stats in groupes.items()}
+            self._cache[cle_cache] = resultat
+            return resultat
+
+
+def verifier_valeurs_non_finies():
+    """
+    Les valeurs infinies, NaN ou trop grandes (acceptées par les modèles) sont ignorées :
+    les statistiques sont celles des seules valeurs finies, par mise à jour comme par chargement.
+    """
+    infini = float("inf")
+    personnages = [
+        {"id": 1, "equipe": "A", "position": "P", "competences": {"force": 80, "technique": 70}},
+        {"id": 2, "equipe": "A", "position": "P", "competences": {"force": 60, "technique": infini}},
+        {"id": 3, "equipe": "B", "position": "P", "competences": {"force": 10 ** 400, "technique": 50}},
+    ]
+    scores = [
+        {"personnage_id": 1, "equipe": "A", "position": "P", "score_global": 7.5},
+        {"personnage_id": 2, "equipe": "A", "position": "P", "score_global": infini},
+        {"personnage_id": 3, "equipe": "B", "position": "P", "score_global": -infini},
+        {"personnage_id": 4, "equipe": "B", "position": "P", "score_global": float("nan")},
+    ]
+
+    par_modification = MoteurColonnes()
+    for personnage in personnages:
+        par_modification.personnage_modifie(None, personnage)
+    for score in scores:
+        par_modification.score_modifie(None, score)
+    par_chargement = MoteurColonnes()
+    par_chargement.charger(
+        [(p["id"], p["equipe"], p["position"], *(p["competences"].get(c) for c in CHAMPS_COMPETENCES)) for p in personnages],
+        [(s["personnage_id"], s["equipe"], s["position"], s["score_global"]) for s in scores],
+    )
+
+    for moteur in (par_modification, par_chargement):
+        stats = moteur.statistiques("equipe")
+        assert stats["A"]["force"]["nombre"] == 2 and stats["A"]["force"]["moyenne"] == 70
+        assert stats["A"]["technique"] == {"nombre": 1, "moyenne": 70, "min": 70, "max": 70,
+                                           "p25": 70, "p50": 70, "p75": 70, "p90": 70}
+        assert "force" not in stats["B"] and stats["B"]["technique"]["nombre"] == 1
+        assert stats["A"]["score_global"]["nombre"] == 1 and stats["A"]["score_global"]["max"] == 7.5
+        assert "score_global" not in stats["B"]
+
+    print("✅ valeurs non finies ignorées par les statistiques des compétences")
+
+
+if __name__ == "__main__":
+    verifier_valeurs_non_finies()
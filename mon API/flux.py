@@ -0,0 +1,194 @@
+import codecs
+import json
+
+
+# Fonction pour décoder un corps de requête contenant un lot d'éléments.
+# Accepte un tableau JSON ou du NDJSON (un objet JSON par ligne).
+# Retourne une liste de (élément décodé, erreur) : l'erreur est None si la ligne est valide.
+def decoder_lot(corps: bytes):
+    texte = corps.decode("utf-8").strip()
+    if not texte:
+        return []
+
+    if texte.startswith("["):
+        try:
+            elements = json.loads(texte)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Tableau JSON invalide: {e}")
+        return [(element, None) for element in elements]
+
+    lignes = []
+    for numero, ligne in enumerate(texte.splitlines(), start=1):
+        ligne = ligne.strip()
+        if not ligne:
+            continue
+        try:
+            lignes.append((json.loads(ligne), None))
+        except json.JSONDecodeError as e:
+            lignes.append((None, f"Ligne {numero}: JSON invalide ({e})"))
+    return lignes
+
+
+# Fonction pour décoder au fil de l'eau un flux d'octets (tableau JSON ou NDJSON).
+# Les éléments sont produits dès qu'ils sont complets : le corps n'est jamais chargé en entier.
+# Produit des (élément décodé, erreur) comme decoder_lot.
+# Des octets qui ne sont pas de l'UTF-8 valide arrêtent la lecture : les éléments complets
+# qui les précèdent sont produits, puis une dernière erreur.
+async def iterer_flux_json(morceaux):
+    decodeur_utf8 = codecs.getincrementaldecoder("utf-8")()
+    decodeur_json = json.JSONDecoder()
+    tampon = ""
+    mode = None  # "tableau" ou "ndjson", déterminé par le premier caractère
+    numero_ligne = 0
+    fin_tableau = False
+    erreur_encodage = None
+
+    async for morceau in morceaux:
+        try:
+            tampon += decodeur_utf8.decode(morceau)
+        except UnicodeDecodeError as e:
+            # Garder le texte valide qui précède les octets invalides
+            tampon += e.object[:e.start].decode("utf-8")
+            erreur_encodage = f"Encodage UTF-8 invalide ({e.reason})"
+
+        if mode is None:
+            tampon = tampon.lstrip()
+            if not tampon and erreur_encodage is None:
+                continue
+            if tampon.startswith("["):
+                mode = "tableau"
+                tampon = tampon[1:]
+            else:
+                mode = "ndjson"
+
+        if mode == "ndjson":
+            *lignes, tampon = tampon.split("\n")
+            for ligne in lignes:
+                numero_ligne += 1
+                resultat = _decoder_ligne(ligne, numero_ligne)
+                if resultat is not None:
+                    yield resultat
+        elif not fin_tableau:
+            elements, tampon, fin_tableau = _decoder_tableau(decodeur_json, tampon, False)
+            for element in elements:
+                yield element
+
+        if erreur_encodage:
+            # L'élément en cours (incomplet) est celui qui contient les octets invalides
+            yield None, erreur_encodage
+            return
+
+    try:
+        tampon += decodeur_utf8.decode(b"", final=True)
+    except UnicodeDecodeError as e:
+        yield None, f"Encodage UTF-8 invalide ({e.reason})"
+        return
+    if mode == "ndjson":
+        resultat = _decoder_ligne(tampon, numero_ligne + 1)
+        if resultat is not None:
+            yield resultat
+    elif mode == "tableau" and not fin_tableau:
+        elements, tampon, fin_tableau = _decoder_tableau(decodeur_json, tampon, True)
+        for element in elements:
+            yield element
+        if not fin_tableau:
+            yield None, "Tableau JSON incomplet"
+
+
+def _decoder_ligne(ligne, numero):
+    ligne = ligne.strip()
+    if not ligne:
+        return None
+    try:
+        return json.loads(ligne), None
+    except json.JSONDecodeError as e:
+        return None, f"Ligne {numero}: JSON invalide ({e})"
+
+
+# Décode les éléments complets d'un morceau de tableau JSON (après le "[" initial).
+# Un élément invalide est signalé puis ignoré jusqu'à la virgule qui le termine : les éléments
+# suivants sont décodés normalement.
+# Retourne (éléments, reste du tampon, tableau terminé).
+def _decoder_tableau(decodeur_json, tampon, final):
+    elements = []
+    while True:
+        tampon = tampon.lstrip().lstrip(",").lstrip()
+        if not tampon:
+            return elements, tampon, False
+        if tampon.startswith("]"):
+            return elements, tampon[1:], True
+        try:
+            element, position = decodeur_json.raw_decode(tampon)
+        except json.JSONDecodeError as e:
+            fin = _fin_element(tampon)
+            if fin < 0:
+                if final:
+                    elements.append((None, f"Tableau JSON invalide: {e}"))
+                    return elements, "", True
+                # Élément incomplet : attendre la suite du flux
+                return elements, tampon, False
+            # Élément complet mais invalide : passer à l'élément suivant (le "]" final est gardé)
+            elements.append((None, f"Élément JSON invalide ({e.msg}): {tampon[:fin].strip()[:100]}"))
+            tampon = tampon[fin + 1:] if tampon[fin] == "," else tampon[fin:]
+            continue
+        # Un nombre en fin de tampon peut être tronqué : attendre le séparateur suivant
+        if not final and not tampon[position:].strip():
+            return elements, tampon, False
+        elements.append((element, None))
+        tampon = tampon[position:]
+
+
+# Position de la virgule ou du "]" qui termine l'élément au début du tampon
+# (hors chaînes et structures imbriquées), -1 si l'élément n'est pas encore terminé.
+def _fin_element(tampon):
+    profondeur = 0
+    dans_chaine = False
+    echappement = False
+    for position, caractere in enumerate(tampon):
+        if dans_chaine:
+            if echappement:
+                echappement = False
+            elif caractere == "\\":
+                echappement = True
+            elif caractere == '"':
+                dans_chaine = False
+        elif caractere == '"':
+            dans_chaine = True
+        elif caractere in "[{":
+            profondeur += 1
+        elif caractere in "]}":
+            if not profondeur:
+                return position
+            profondeur -= 1
+        elif caractere == "," and not profondeur:
+            return position
+    return -1
+
+
+def verifier_elements_invalides():
+    """
+    Un élément invalide au milieu d'un tableau (envoyé en petits morceaux) est signalé
+    et les éléments qui le suivent sont décodés
+    """
+    import asyncio
+
+    corps = b'[{"id": 1}, {"id": 2, "nom": "a,b]"}, {"id": 3 "x": [1, 2]}, truc, {"id": 4}, {"id": 5}]'
+
+    async def lire(taille):
+        async def morceaux():
+            for debut in range(0, len(corps), taille):
+                yield corps[debut:debut + taille]
+        return [resultat async for resultat in iterer_flux_json(morceaux())]
+
+    for taille in (1, 3, 7, len(corps)):
+        resultats = asyncio.run(lire(taille))
+        ids = [element["id"] for element, erreur in resultats if erreur is None]
+        erreurs = [erreur for _, erreur in resultats if erreur is not None]
+        assert ids == [1, 2, 4, 5], f"morceaux de {taille} octets : ids {ids}"
+        assert len(erreurs) == 2 and all(erreur.startswith("Élément JSON invalide") for erreur in erreurs), erreurs
+        assert [erreur is None for _, erreur in resultats] == [True, True, False, False, True, True]
+    print("✅ Éléments invalides signalés, éléments suivants décodés")
+
+
+if __name__ == "__main__":
+    verifier_elements_invalides()
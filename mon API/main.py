@@ -1,14 +1,56 @@
-from fastapi import FastAPI, Header, HTTPException, Body, BackgroundTasks
+from fastapi import FastAPI, Header, HTTPException, Body, BackgroundTasks, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional, Dict
-import json
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Optional, Dict, Union
+from contextlib import asynccontextmanager
 import os
-import requests
 from datetime import datetime
+from stockage import StockageJSON
+from stockage_sqlite import StockageSQLite
+from pagination import LIMITE_MAX, encoder_curseur, decoder_curseur, analyser_champs, projeter
+from flux import decoder_lot, iterer_flux_json
+from webhooks import DiffuseurWebhooks, compiler_filtres
+from serialisation import ReponseJSON, encoder, reponse_liste
+from cache_http import definir_entetes_cache, etiquette, etiquette_contenu, non_modifie
+
+# Chemin du fichier de données
+chemin_personnages = os.path.join(os.path.dirname(__file__), "personnages.json")
+chemin_scores = os.path.join(os.path.dirname(__file__), "scores.json")
+chemin_webhooks = os.path.join(os.path.dirname(__file__), "webhooks.json")
+chemin_file_webhooks = os.path.join(os.path.dirname(__file__), "webhooks_file.db")
+chemin_base = os.environ.get("MANGA_API_BASE", os.path.join(os.path.dirname(__file__), "manga.db"))
+
+# Stockage des données : "json" (fichiers JSON servis depuis la mémoire, par défaut)
+# ou "sqlite" (base SQLite). Avec plusieurs workers, utiliser "sqlite" ou "json"
+# avec MANGA_API_MULTI_PROCESSUS=1.
+STOCKAGE = os.environ.get("MANGA_API_STOCKAGE", "json")
+if STOCKAGE == "sqlite":
+    # Au premier démarrage, la base est remplie avec le contenu des fichiers JSON
+    stockage = StockageSQLite(chemin_base, chemins_json=(chemin_personnages, chemin_scores, chemin_webhooks))
+elif STOCKAGE == "json":
+    stockage = StockageJSON(chemin_personnages, chemin_scores, chemin_webhooks)
+else:
+    raise ValueError(f"Stockage inconnu: {STOCKAGE} (valeurs possibles: json, sqlite)")
+
+# Diffusion des événements aux webhooks (file de livraison persistante, abonnés gardés en mémoire)
+diffuseur_webhooks = DiffuseurWebhooks(chemin_file_webhooks)
+stockage.abonner_webhooks(diffuseur_webhooks.webhook_modifie)
+
+# Démarrage et arrêt du stockage et de la diffusion des webhooks
+@asynccontextmanager
+async def cycle_de_vie(app):
+    stockage.demarrer()
+    diffuseur_webhooks.demarrer()
+    yield
+    # Terminer les livraisons de webhooks en cours
+    diffuseur_webhooks.arreter()
+    # Écrire les dernières modifications avant l'arrêt
+    stockage.arreter()
 
 # Initialiser l'application
-app = FastAPI(title="API de personnages de manga")
+# (réponses encodées avec orjson quand il est installé)
+app = FastAPI(title="API de personnages de manga", lifespan=cycle_de_vie, default_response_class=ReponseJSON)
 
 # Configuration CORS - Version très permissive pour le développement
 app.add_middleware(
@@ -17,12 +59,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Curseur-Suivant", "ETag", "Last-Modified"],
 )
 
-# Chemin du fichier de données
-chemin_personnages = os.path.join(os.path.dirname(__file__), "personnages.json")
-chemin_scores = os.path.join(os.path.dirname(__file__), "scores.json")
-chemin_webhooks = os.path.join(os.path.dirname(__file__), "webhooks.json")
+# Nombre de personnages enregistrés à la fois lors d'un import en masse
+TAILLE_LOT_IMPORT = int(os.environ.get("MANGA_API_TAILLE_LOT_IMPORT", "1000"))
 
 # Token d'authentification (dans une application réelle, utilisez un mécanisme plus sécurisé)
 TOKEN_SECRET = "manga_api_secret_2025"
@@ -54,110 +95,195 @@ class ScoreModel(BaseModel):
     forces: List[str]
     faiblesses: List[str]
 
+# Modèle pour le regroupement des événements d'un webhook
+class LotWebhookModel(BaseModel):
+    taille_max: int = Field(100, ge=1)  # Nombre maximum d'événements par livraison
+    attente_max: float = Field(5.0, ge=0)  # Délai maximum (secondes) avant l'envoi d'un lot
+    fusionner: bool = True  # Ne garder que le dernier événement de chaque personnage dans un lot
+
+# Valeur d'un filtre de webhook : un scalaire (égalité) ou une liste de scalaires (appartenance)
+ValeurFiltre = Union[str, int, float, bool, None]
+
 # Modèle pour l'enregistrement des webhooks
 class WebhookModel(BaseModel):
     url: str
-    events: List[str]  # Types d'événements à notifier ("nouveau_personnage", "nouveau_score", "mise_a_jour_score")
+    events: List[str]  # Types d'événements à notifier ("nouveau_personnage", "lot_personnages", "nouveau_score", "mise_a_jour_score", "lot_scores")
     description: Optional[str] = None
+    lot: Optional[LotWebhookModel] = None  # Si renseigné, les événements sont livrés par lots
+    filtres: Optional[Dict[str, Union[ValeurFiltre, List[ValeurFiltre]]]] = None  # Ex: {"equipe": "Nankatsu SC"} pour ne recevoir que cette équipe
+
+# Fonction pour lire le curseur de pagination fourni par le client
+def lire_curseur(cursor: Optional[str]):
+    if not cursor:
+        return None
+    try:
+        return decoder_curseur(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-# Fonction pour charger les personnages
-def charger_personnages():
-    if not os.path.exists(chemin_personnages):
-        # Créer un fichier vide avec une liste vide
-        with open(chemin_personnages, "w", encoding="utf-8") as fichier:
-            json.dump([], fichier)
-        return []
-    
-    with open(chemin_personnages, "r", encoding="utf-8") as fichier:
-        return json.load(fichier)
-
-# Fonction pour sauvegarder les personnages
-def sauvegarder_personnages(personnages):
-    with open(chemin_personnages, "w", encoding="utf-8") as fichier:
-        json.dump(personnages, fichier, indent=2, ensure_ascii=False)
-
-# Fonction pour charger les scores
-def charger_scores():
-    if not os.path.exists(chemin_scores):
-        # Créer un fichier vide avec une liste vide
-        with open(chemin_scores, "w", encoding="utf-8") as fichier:
-            json.dump([], fichier)
-        return []
-    
-    with open(chemin_scores, "r", encoding="utf-8") as fichier:
-        return json.load(fichier)
-
-# Fonction pour sauvegarder les scores
-def sauvegarder_scores(scores):
-    with open(chemin_scores, "w", encoding="utf-8") as fichier:
-        json.dump(scores, fichier, indent=2, ensure_ascii=False)
-
-# Fonction pour charger les webhooks
-def charger_webhooks():
-    if not os.path.exists(chemin_webhooks):
-        # Créer un fichier vide avec une liste vide
-        with open(chemin_webhooks, "w", encoding="utf-8") as fichier:
-            json.dump([], fichier)
-        return []
-    
-    with open(chemin_webhooks, "r", encoding="utf-8") as fichier:
-        return json.load(fichier)
-
-# Fonction pour sauvegarder les webhooks
-def sauvegarder_webhooks(webhooks):
-    with open(chemin_webhooks, "w", encoding="utf-8") as fichier:
-        json.dump(webhooks, fichier, indent=2, ensure_ascii=False)
+# Fonction pour ajouter les informations de pagination dans les en-têtes de la réponse
+def definir_entetes_pagination(response: Response, total: int, cle_suivante):
+    response.headers["X-Total-Count"] = str(total)
+    if cle_suivante is not None:
+        response.headers["X-Curseur-Suivant"] = encoder_curseur(cle_suivante)
+
+# Fonction pour lire la version d'une ou plusieurs collections : (ETag, date de dernière modification)
+def version_collections(*collections):
+    etats = [stockage.etat(collection) for collection in collections]
+    return etiquette(".".join(version for version, _ in etats)), max(modifie_le for _, modifie_le in etats)
 
 # Fonction pour déclencher les webhooks enregistrés
+# (l'événement est ajouté à la file de livraison, les envois sont faits par le diffuseur)
 def declencher_webhooks(event_type: str, payload: Dict):
-    webhooks = charger_webhooks()
-    for webhook in webhooks:
-        if event_type in webhook["events"]:
-            try:
-                # Envoyer la requête au webhook
-                requests.post(
-                    webhook["url"],
-                    json={
-                        "event_type": event_type,
-                        "timestamp": datetime.now().isoformat(),
-                        "payload": payload
-                    },
-                    headers={"Content-Type": "application/json"},
-                    timeout=5  # Timeout de 5 secondes
-                )
-            except Exception as e:
-                print(f"Erreur lors de l'envoi au webhook {webhook['url']}: {str(e)}")
+    # Prendre en compte les abonnements créés par les autres workers
+    stockage.rafraichir_webhooks()
+    diffuseur_webhooks.diffuser(event_type, payload)
 
 # Créer un endpoint GET /personnages
 @app.get("/personnages")
-def get_personnages(prenom: Optional[str] = None):
+def get_personnages(
+    request: Request,
+    prenom: Optional[str] = None,
+    nom: Optional[str] = None,
+    equipe: Optional[str] = None,
+    position: Optional[str] = None,
+    prefixe: bool = False,
+    limit: Optional[int] = Query(None, ge=1, le=LIMITE_MAX),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
     """
-    Retourne la liste de tous les personnages.
-    Peut filtrer par prénom si le paramètre prenom est fourni.
+    Retourne la liste des personnages, triés par ID.
+    Peut filtrer par prénom, nom, équipe et position (recherche "contient", ou "commence par"
+    si prefixe=true), sans tenir compte des majuscules ni des accents.
+    Pagination avec limit/offset ou avec le curseur renvoyé dans l'en-tête X-Curseur-Suivant.
+    Le paramètre fields permet de ne récupérer que certains champs (ex: id,prenom,equipe).
+    Tableau JSON, ou NDJSON avec "Accept: application/x-ndjson" ; compression gzip/brotli selon Accept-Encoding.
+    Réponse 304 si l'ETag envoyé dans If-None-Match est toujours valable.
     """
-    personnages = charger_personnages()
-    
-    # Filtrer par prénom si demandé
-    if prenom:
-        personnages = [p for p in personnages if prenom.lower() in p["prenom"].lower()]
+    # Rien n'est lu ni encodé si le client a déjà la version courante
+    etag, modifie_le = version_collections("personnages")
+    reponse_304 = non_modifie(request, etag, modifie_le)
+    if reponse_304 is not None:
+        return reponse_304
+    
+    champs = analyser_champs(fields)
+    
+    filtres = {"prenom": prenom, "nom": nom, "equipe": equipe, "position": position}
+    # Sans projection, les octets JSON de chaque personnage sont déjà prêts : ils sont simplement concaténés
+    if limit is None:
+        # Collection complète : lue et envoyée par morceaux
+        total, personnages = stockage.iterer_personnages(
+            filtres, prefixe, offset, lire_curseur(cursor), encodes=champs is None
+        )
+        cle_suivante = None
+    else:
+        personnages, total, cle_suivante = stockage.lister_personnages(
+            filtres, prefixe, limit, offset, lire_curseur(cursor), encodes=champs is None
+        )
+    if champs is not None:
+        personnages = (encoder(projeter(p, champs)) for p in personnages)
+    response = reponse_liste(request, personnages)
+    definir_entetes_pagination(response, total, cle_suivante)
+    definir_entetes_cache(response, etag, modifie_le)
+    return response
+
+# Endpoint pour récupérer tous les scores
+# (déclaré avant /personnages/{id} pour que "scores" ne soit pas pris pour un ID)
+@app.get("/personnages/scores")
+def get_all_scores(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=LIMITE_MAX),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    token: str = Header(None)
+):
+    """
+    Récupère les scores, triés par personnage_id (accès sécurisé).
+    Pagination avec limit/offset ou avec le curseur renvoyé dans l'en-tête X-Curseur-Suivant.
+    Le paramètre fields permet de ne récupérer que certains champs (ex: personnage_id,score_global).
+    Tableau JSON, ou NDJSON avec "Accept: application/x-ndjson" ; compression gzip/brotli selon Accept-Encoding.
+    Réponse 304 si l'ETag envoyé dans If-None-Match est toujours valable.
+    """
+    # Vérification du token
+    if token != TOKEN_SECRET:
+        raise HTTPException(status_code=401, detail="Token d'authentification invalide")
     
-    return personnages
+    etag, modifie_le = version_collections("scores")
+    reponse_304 = non_modifie(request, etag, modifie_le, prive=True)
+    if reponse_304 is not None:
+        return reponse_304
+    
+    champs = analyser_champs(fields)
+    if limit is None:
+        # Collection complète : lue et envoyée par morceaux
+        total, scores = stockage.iterer_scores(offset, lire_curseur(cursor), encodes=champs is None)
+        cle_suivante = None
+    else:
+        scores, total, cle_suivante = stockage.lister_scores(limit, offset, lire_curseur(cursor), encodes=champs is None)
+    if champs is not None:
+        scores = (encoder(projeter(score, champs)) for score in scores)
+    response = reponse_liste(request, scores)
+    definir_entetes_pagination(response, total, cle_suivante)
+    definir_entetes_cache(response, etag, modifie_le, prive=True)
+    return response
+
+# Endpoint pour le classement des meilleurs scores
+@app.get("/personnages/scores/top")
+def get_top_scores(
+    request: Request,
+    n: int = Query(10, ge=1, le=LIMITE_MAX),
+    equipe: Optional[str] = None,
+    position: Optional[str] = None,
+    token: str = Header(None)
+):
+    """
+    Récupère les n meilleurs scores par score_global décroissant (à égalité, par personnage_id),
+    éventuellement limités à une équipe et/ou une position (accès sécurisé).
+    Le nombre de scores classés est renvoyé dans l'en-tête X-Total-Count.
+    """
+    # Vérification du token
+    if token != TOKEN_SECRET:
+        raise HTTPException(status_code=401, detail="Token d'authentification invalide")
+
+    etag, modifie_le = version_collections("scores")
+    reponse_304 = non_modifie(request, etag, modifie_le, prive=True)
+    if reponse_304 is not None:
+        return reponse_304
+
+    # Lu dans les classements tenus à jour par le stockage (pas de tri des scores)
+    scores, total = stockage.meilleurs_scores(n, equipe, position, encodes=True)
+    response = reponse_liste(request, scores)
+    definir_entetes_pagination(response, total, None)
+    definir_entetes_cache(response, etag, modifie_le, prive=True)
+    return response
+
 
 # Créer un endpoint GET /personnages/{id}
 @app.get("/personnages/{id}")
-def get_personnage(id: int):
+def get_personnage(id: int, request: Request):
     """
     Retourne un personnage spécifique par son ID
     """
-    personnages = charger_personnages()
-    for personnage in personnages:
-        if personnage["id"] == id:
-            return personnage
-    raise HTTPException(status_code=404, detail="Personnage non trouvé")
+    personnage = stockage.obtenir_personnage(id, encode=True)
+    if personnage is None:
+        raise HTTPException(status_code=404, detail="Personnage non trouvé")
+    
+    # ETag calculé à partir des octets déjà encodés du personnage
+    etag = etiquette_contenu(personnage)
+    _, modifie_le = stockage.etat("personnages")
+    reponse_304 = non_modifie(request, etag, modifie_le)
+    if reponse_304 is not None:
+        return reponse_304
+    response = Response(content=personnage, media_type="application/json")
+    definir_entetes_cache(response, etag, modifie_le)
+    return response
 
 # Endpoint sécurisé - nécessite un token d'authentification
 @app.get("/personnages/stats/equipe")
-def get_stats_equipe(token: str = Header(None)):
+def get_stats_equipe(request: Request, response: Response, token: str = Header(None)):
     """
     Retourne des statistiques sur les équipes (accès sécurisé)
     """
@@ -165,26 +291,25 @@ def get_stats_equipe(token: str = Header(None)):
     if token != TOKEN_SECRET:
         raise HTTPException(status_code=401, detail="Token d'authentification invalide")
     
-    # Calcul des statistiques
-    personnages = charger_personnages()
-    equipes = {}
-    
-    for personnage in personnages:
-        equipe = personnage["equipe"]
-        if equipe in equipes:
-            equipes[equipe] += 1
-        else:
-            equipes[equipe] = 1
+    # Les statistiques ne changent qu'avec les personnages ou les scores
+    etag, modifie_le = version_collections("personnages", "scores")
+    reponse_304 = non_modifie(request, etag, modifie_le, prive=True)
+    if reponse_304 is not None:
+        return reponse_304
+    definir_entetes_cache(response, etag, modifie_le, prive=True)
     
+    # Statistiques tenues à jour par le stockage (pas de recalcul en Python)
+    stats = stockage.statistiques("equipe")
     return {
         "statistiques": "équipes",
-        "total_personnages": len(personnages),
-        "distribution_equipes": equipes
+        "total_personnages": stats["total_personnages"],
+        "distribution_equipes": stats["distribution"],
+        "moyennes_equipes": stats["moyennes"]
     }
 
 # Autre endpoint sécurisé
 @app.get("/personnages/stats/positions")
-def get_stats_positions(token: str = Header(None)):
+def get_stats_positions(request: Request, response: Response, token: str = Header(None)):
     """
     Retourne des statistiques sur les positions des joueurs (accès sécurisé)
     """
@@ -192,21 +317,63 @@ def get_stats_positions(token: str = Header(None)):
     if token != TOKEN_SECRET:
         raise HTTPException(status_code=401, detail="Token d'authentification invalide")
     
-    # Calcul des statistiques
-    personnages = charger_personnages()
-    positions = {}
-    
-    for personnage in personnages:
-        position = personnage["position"]
-        if position in positions:
-            positions[position] += 1
-        else:
-            positions[position] = 1
+    # Les statistiques ne changent qu'avec les personnages ou les scores
+    etag, modifie_le = version_collections("personnages", "scores")
+    reponse_304 = non_modifie(request, etag, modifie_le, prive=True)
+    if reponse_304 is not None:
+        return reponse_304
+    definir_entetes_cache(response, etag, modifie_le, prive=True)
     
+    # Statistiques tenues à jour par le stockage (pas de recalcul en Python)
+    stats = stockage.statistiques("position")
     return {
         "statistiques": "positions",
-        "total_personnages": len(personnages),
-        "distribution_positions": positions
+        "total_personnages": stats["total_personnages"],
+        "distribution_positions": stats["distribution"],
+        "moyennes_positions": stats["moyennes"]
+    }
+
+# Endpoint sécurisé : répartition des compétences et des scores par équipe ou par position
+@app.get("/personnages/stats/competences")
+def get_stats_competences(
+    request: Request,
+    response: Response,
+    par: str = Query("equipe", description="Regroupement : equipe ou position"),
+    percentiles: str = Query("25,50,75,90", description="Percentiles calculés, séparés par des virgules (0 à 100)"),
+    token: str = Header(None)
+):
+    """
+    Retourne, pour chaque équipe ou position, le nombre, la moyenne, le minimum, le maximum
+    et les percentiles de chaque compétence et du score global (accès sécurisé)
+    """
+    # Vérification du token
+    if token != TOKEN_SECRET:
+        raise HTTPException(status_code=401, detail="Token d'authentification invalide")
+    if par not in ("equipe", "position"):
+        raise HTTPException(status_code=400, detail="Regroupement invalide (valeurs possibles: equipe, position)")
+    try:
+        valeurs_percentiles = tuple(float(p) for p in percentiles.split(",") if p.strip())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Percentiles invalides")
+    if not all(0 <= p <= 100 for p in valeurs_percentiles):
+        raise HTTPException(status_code=400, detail="Les percentiles doivent être compris entre 0 et 100")
+
+    # Les statistiques ne changent qu'avec les personnages ou les scores
+    etag, modifie_le = version_collections("personnages", "scores")
+    reponse_304 = non_modifie(request, etag, modifie_le, prive=True)
+    if reponse_304 is not None:
+        return reponse_304
+    definir_entetes_cache(response, etag, modifie_le, prive=True)
+
+    # Calcul vectorisé sur les colonnes NumPy du stockage
+    try:
+        groupes = stockage.statistiques_competences(par, valeurs_percentiles)
+    except RuntimeError as erreur:
+        raise HTTPException(status_code=503, detail=str(erreur))
+    return {
+        "statistiques": "compétences",
+        "par": par,
+        "groupes": groupes
     }
 
 # NOUVEL ENDPOINT POUR L'EXERCICE 3
@@ -220,38 +387,15 @@ def ajouter_score(score: ScoreModel, background_tasks: BackgroundTasks, token: s
         raise HTTPException(status_code=401, detail="Token d'authentification invalide")
     
     # Vérifier si le personnage existe
-    personnages = charger_personnages()
-    personnage_trouve = None
-    
-    for personnage in personnages:
-        if personnage["id"] == score.personnage_id:
-            personnage_trouve = personnage
-            break
+    personnage_trouve = stockage.obtenir_personnage(score.personnage_id)
     
     if not personnage_trouve:
         raise HTTPException(status_code=404, detail=f"Personnage avec l'ID {score.personnage_id} non trouvé")
     
-    # Charger les scores existants
-    scores = charger_scores()
-    
-    # Vérifier si un score existe déjà pour ce personnage
-    score_existe = False
-    event_type = "nouveau_score"
-    
-    for i, s in enumerate(scores):
-        if s["personnage_id"] == score.personnage_id:
-            # Mettre à jour le score existant
-            scores[i] = score.dict()
-            score_existe = True
-            event_type = "mise_a_jour_score"
-            break
-    
-    # Si le score n'existe pas, l'ajouter
-    if not score_existe:
-        scores.append(score.dict())
-    
-    # Sauvegarder les scores mis à jour
-    sauvegarder_scores(scores)
+    # Ajouter le score, ou mettre à jour le score existant
+    # (avec le stockage JSON, la sauvegarde sur disque est faite en arrière-plan)
+    ancien_score = stockage.upsert_score(score.dict())
+    event_type = "mise_a_jour_score" if ancien_score is not None else "nouveau_score"
     
     # Préparer la charge utile pour le webhook
     payload = {
@@ -269,22 +413,81 @@ def ajouter_score(score: ScoreModel, background_tasks: BackgroundTasks, token: s
         "timestamp": datetime.now().isoformat()
     }
 
-# Endpoint pour récupérer tous les scores
-@app.get("/personnages/scores")
-def get_all_scores(token: str = Header(None)):
+# Fonction pour valider et enregistrer un lot de scores en une seule écriture
+def enregistrer_lot_scores(lignes):
+    resultats = []
+    valides = []
+    
+    # Validation de tous les éléments en une passe
+    for index, (element, erreur) in enumerate(lignes):
+        resultat = {"index": index, "personnage_id": None, "statut": "invalide"}
+        if isinstance(element, dict):
+            resultat["personnage_id"] = element.get("personnage_id")
+        resultats.append(resultat)
+        if erreur is not None:
+            resultat["erreur"] = erreur
+            continue
+        try:
+            score = ScoreModel(**element)
+        except (ValidationError, TypeError) as e:
+            resultat["erreur"] = str(e)
+            continue
+        if not stockage.personnage_existe(score.personnage_id):
+            resultat["statut"] = "non_trouve"
+            resultat["erreur"] = f"Personnage avec l'ID {score.personnage_id} non trouvé"
+            continue
+        valides.append((resultat, score.dict()))
+    
+    # Une seule écriture pour tout le lot
+    anciens = stockage.upsert_scores([score for _, score in valides])
+    for (resultat, _), ancien in zip(valides, anciens):
+        resultat["statut"] = "mis_a_jour" if ancien is not None else "cree"
+    
+    return resultats
+
+# Endpoint pour ajouter ou mettre à jour des scores par lot
+@app.post("/personnages/scores/batch")
+async def ajouter_scores_lot(request: Request, background_tasks: BackgroundTasks, token: str = Header(None)):
     """
-    Récupère tous les scores (accès sécurisé)
+    Ajoute ou met à jour un lot de scores (accès sécurisé).
+    Le corps est un tableau JSON de scores ou du NDJSON (un score par ligne).
+    Retourne le statut de chaque élément : cree, mis_a_jour, non_trouve ou invalide.
     """
     # Vérification du token
     if token != TOKEN_SECRET:
         raise HTTPException(status_code=401, detail="Token d'authentification invalide")
     
-    scores = charger_scores()
-    return scores
+    try:
+        lignes = decoder_lot(await request.body())
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    resultats = await run_in_threadpool(enregistrer_lot_scores, lignes)
+    
+    compteurs = {"cree": 0, "mis_a_jour": 0, "non_trouve": 0, "invalide": 0}
+    for resultat in resultats:
+        compteurs[resultat["statut"]] += 1
+    
+    # Un seul événement webhook pour tout le lot
+    if compteurs["cree"] or compteurs["mis_a_jour"]:
+        payload = {
+            "compteurs": compteurs,
+            "personnages_crees": [r["personnage_id"] for r in resultats if r["statut"] == "cree"],
+            "personnages_mis_a_jour": [r["personnage_id"] for r in resultats if r["statut"] == "mis_a_jour"]
+        }
+        background_tasks.add_task(declencher_webhooks, "lot_scores", payload)
+    
+    return {
+        "status": "success",
+        "message": f"{len(resultats)} scores traités",
+        "compteurs": compteurs,
+        "resultats": resultats,
+        "timestamp": datetime.now().isoformat()
+    }
 
 # Endpoint pour récupérer le score d'un personnage spécifique
 @app.get("/personnages/{id}/score")
-def get_personnage_score(id: int, token: str = Header(None)):
+def get_personnage_score(id: int, request: Request, token: str = Header(None)):
     """
     Récupère le score d'un personnage spécifique (accès sécurisé)
     """
@@ -292,12 +495,40 @@ def get_personnage_score(id: int, token: str = Header(None)):
     if token != TOKEN_SECRET:
         raise HTTPException(status_code=401, detail="Token d'authentification invalide")
     
-    scores = charger_scores()
-    for score in scores:
-        if score["personnage_id"] == id:
-            return score
-    
-    raise HTTPException(status_code=404, detail=f"Score pour le personnage {id} non trouvé")
+    score = stockage.obtenir_score(id, encode=True)
+    if score is None:
+        raise HTTPException(status_code=404, detail=f"Score pour le personnage {id} non trouvé")
+    
+    etag = etiquette_contenu(score)
+    _, modifie_le = stockage.etat("scores")
+    reponse_304 = non_modifie(request, etag, modifie_le, prive=True)
+    if reponse_304 is not None:
+        return reponse_304
+    response = Response(content=score, media_type="application/json")
+    definir_entetes_cache(response, etag, modifie_le, prive=True)
+    return response
+
+# Endpoint pour le rang du score d'un personnage
+@app.get("/personnages/{id}/score/rang")
+def get_rang_score(id: int, request: Request, response: Response, token: str = Header(None)):
+    """
+    Retourne le rang du score d'un personnage (1 = meilleur score_global) : au classement général,
+    dans son équipe et dans sa position (accès sécurisé)
+    """
+    # Vérification du token
+    if token != TOKEN_SECRET:
+        raise HTTPException(status_code=401, detail="Token d'authentification invalide")
+
+    etag, modifie_le = version_collections("scores")
+    reponse_304 = non_modifie(request, etag, modifie_le, prive=True)
+    if reponse_304 is not None:
+        return reponse_304
+
+    rang = stockage.rang_score(id)
+    if rang is None:
+        raise HTTPException(status_code=404, detail=f"Score pour le personnage {id} non trouvé")
+    definir_entetes_cache(response, etag, modifie_le, prive=True)
+    return {"personnage_id": id, **rang}
 
 # Ajout d'un endpoint pour créer un personnage
 @app.post("/personnages")
@@ -309,17 +540,10 @@ def create_personnage(personnage: PersonnageModel, background_tasks: BackgroundT
     if token != TOKEN_SECRET:
         raise HTTPException(status_code=401, detail="Token d'authentification invalide")
     
-    personnages = charger_personnages()
-    
-    # Vérifier si l'ID existe déjà
-    for p in personnages:
-        if p["id"] == personnage.id:
-            raise HTTPException(status_code=409, detail=f"Un personnage avec l'ID {personnage.id} existe déjà")
-    
-    # Ajouter le nouveau personnage
+    # Ajouter le nouveau personnage (refusé si l'ID existe déjà)
     nouveau_personnage = personnage.dict()
-    personnages.append(nouveau_personnage)
-    sauvegarder_personnages(personnages)
+    if not stockage.inserer_personnage(nouveau_personnage):
+        raise HTTPException(status_code=409, detail=f"Un personnage avec l'ID {personnage.id} existe déjà")
     
     # Déclencher un webhook en arrière-plan
     background_tasks.add_task(declencher_webhooks, "nouveau_personnage", nouveau_personnage)
@@ -330,6 +554,93 @@ def create_personnage(personnage: PersonnageModel, background_tasks: BackgroundT
         "personnage": personnage
     }
 
+# Fonction pour valider et enregistrer un morceau d'import de personnages
+def enregistrer_lot_personnages(lignes, premier_index):
+    resultats = []
+    valides = []
+    
+    for index, (element, erreur) in enumerate(lignes, start=premier_index):
+        if erreur is None:
+            try:
+                valides.append((index, PersonnageModel(**element).dict()))
+                continue
+            except (ValidationError, TypeError) as e:
+                erreur = str(e)
+        resultats.append({
+            "index": index,
+            "id": element.get("id") if isinstance(element, dict) else None,
+            "statut": "invalide",
+            "erreur": erreur
+        })
+    
+    # Détection des conflits avec l'index des IDs et enregistrement en une seule écriture
+    ajouts = stockage.inserer_personnages([personnage for _, personnage in valides])
+    crees = []
+    for (index, personnage), ajoute in zip(valides, ajouts):
+        if ajoute:
+            crees.append(personnage["id"])
+        else:
+            resultats.append({
+                "index": index,
+                "id": personnage["id"],
+                "statut": "conflit",
+                "erreur": f"Un personnage avec l'ID {personnage['id']} existe déjà"
+            })
+    
+    return crees, resultats
+
+# Endpoint pour importer des personnages en masse
+@app.post("/personnages/bulk")
+async def importer_personnages(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    taille_lot: int = Query(TAILLE_LOT_IMPORT, ge=1),
+    token: str = Header(None)
+):
+    """
+    Importe des personnages en masse (accès sécurisé).
+    Le corps (tableau JSON ou NDJSON) est lu au fil de l'eau et enregistré par lots de taille_lot.
+    Les personnages dont l'ID existe déjà sont signalés en conflit.
+    """
+    # Vérification du token
+    if token != TOKEN_SECRET:
+        raise HTTPException(status_code=401, detail="Token d'authentification invalide")
+    
+    crees = []
+    erreurs = []
+    lot = []
+    total = 0
+    
+    async for ligne in iterer_flux_json(request.stream()):
+        lot.append(ligne)
+        if len(lot) >= taille_lot:
+            crees_lot, erreurs_lot = await run_in_threadpool(enregistrer_lot_personnages, lot, total)
+            crees.extend(crees_lot)
+            erreurs.extend(erreurs_lot)
+            total += len(lot)
+            lot = []
+    
+    if lot:
+        crees_lot, erreurs_lot = await run_in_threadpool(enregistrer_lot_personnages, lot, total)
+        crees.extend(crees_lot)
+        erreurs.extend(erreurs_lot)
+        total += len(lot)
+    
+    # Un seul événement webhook pour tout l'import
+    if crees:
+        background_tasks.add_task(declencher_webhooks, "lot_personnages", {"personnages_crees": crees})
+    
+    return {
+        "status": "success",
+        "message": f"{len(crees)} personnages créés sur {total}",
+        "compteurs": {
+            "cree": len(crees),
+            "conflit": sum(1 for e in erreurs if e["statut"] == "conflit"),
+            "invalide": sum(1 for e in erreurs if e["statut"] == "invalide")
+        },
+        "erreurs": sorted(erreurs, key=lambda e: e["index"])
+    }
+
 # NOUVEAUX ENDPOINTS POUR LES WEBHOOKS - PARTIE 3
 
 @app.post("/subscribe")
@@ -341,16 +652,15 @@ def creer_webhook(webhook: WebhookModel, token: str = Header(None)):
     if token != TOKEN_SECRET:
         raise HTTPException(status_code=401, detail="Token d'authentification invalide")
     
-    webhooks = charger_webhooks()
-    
-    # Vérifier si l'URL existe déjà
-    for w in webhooks:
-        if w["url"] == webhook.url:
-            raise HTTPException(status_code=409, detail=f"Un webhook avec l'URL {webhook.url} existe déjà")
-    
-    # Ajouter le nouveau webhook
-    webhooks.append(webhook.dict())
-    sauvegarder_webhooks(webhooks)
+    # Compiler les filtres avant l'enregistrement : un webhook enregistré doit pouvoir être indexé
+    try:
+        compiler_filtres(webhook.filtres)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Filtres invalides: {str(e)}")
+
+    # Ajouter le nouveau webhook (refusé si l'URL existe déjà)
+    if not stockage.inserer_webhook(webhook.dict()):
+        raise HTTPException(status_code=409, detail=f"Un webhook avec l'URL {webhook.url} existe déjà")
     
     return {
         "status": "success",
@@ -367,28 +677,17 @@ def supprimer_webhook(url: str, token: str = Header(None)):
     if token != TOKEN_SECRET:
         raise HTTPException(status_code=401, detail="Token d'authentification invalide")
     
-    webhooks = charger_webhooks()
-    
     # Chercher et supprimer le webhook
-    webhook_trouve = False
-    for i, w in enumerate(webhooks):
-        if w["url"] == url:
-            webhooks.pop(i)
-            webhook_trouve = True
-            break
-    
-    if not webhook_trouve:
+    if stockage.supprimer_webhook(url) is None:
         raise HTTPException(status_code=404, detail=f"Webhook avec l'URL {url} non trouvé")
     
-    sauvegarder_webhooks(webhooks)
-    
     return {
         "status": "success",
         "message": f"Webhook {url} supprimé avec succès"
     }
 
 @app.get("/webhooks")
-def liste_webhooks(token: str = Header(None)):
+def liste_webhooks(request: Request, response: Response, token: str = Header(None)):
     """
     Liste tous les webhooks enregistrés (accès sécurisé)
     """
@@ -396,9 +695,58 @@ def liste_webhooks(token: str = Header(None)):
     if token != TOKEN_SECRET:
         raise HTTPException(status_code=401, detail="Token d'authentification invalide")
     
-    webhooks = charger_webhooks()
+    etag, modifie_le = version_collections("webhooks")
+    reponse_304 = non_modifie(request, etag, modifie_le, prive=True)
+    if reponse_304 is not None:
+        return reponse_304
+    definir_entetes_cache(response, etag, modifie_le, prive=True)
+    
+    webhooks = stockage.lister_webhooks()
     return webhooks
 
+@app.get("/webhooks/file")
+def etat_file_webhooks(token: str = Header(None)):
+    """
+    Retourne l'état de la file de livraison des webhooks (accès sécurisé)
+    """
+    # Vérification du token
+    if token != TOKEN_SECRET:
+        raise HTTPException(status_code=401, detail="Token d'authentification invalide")
+    
+    return {
+        "livraisons": diffuseur_webhooks.file.compter(),
+        "circuits_ouverts": diffuseur_webhooks.circuits_ouverts()
+    }
+
+@app.get("/webhooks/file/mortes")
+def liste_livraisons_mortes(limit: int = Query(100, ge=1, le=LIMITE_MAX), token: str = Header(None)):
+    """
+    Liste les livraisons abandonnées après trop d'échecs (accès sécurisé)
+    """
+    # Vérification du token
+    if token != TOKEN_SECRET:
+        raise HTTPException(status_code=401, detail="Token d'authentification invalide")
+    
+    return diffuseur_webhooks.file.lister_mortes(limit)
+
+@app.post("/webhooks/file/rejouer")
+def rejouer_livraisons_mortes(id: Optional[int] = None, token: str = Header(None)):
+    """
+    Remet en file les livraisons mortes, ou seulement celle dont l'ID est fourni (accès sécurisé)
+    """
+    # Vérification du token
+    if token != TOKEN_SECRET:
+        raise HTTPException(status_code=401, detail="Token d'authentification invalide")
+    
+    nombre = diffuseur_webhooks.file.rejouer(id)
+    if id is not None and nombre == 0:
+        raise HTTPException(status_code=404, detail=f"Livraison morte avec l'ID {id} non trouvée")
+    
+    return {
+        "status": "success",
+        "message": f"{nombre} livraison(s) remise(s) en file"
+    }
+
 # AJOUT D'UN ENDPOINT POUR SIMULER UN ÉVÉNEMENT (POUR TESTER LES WEBHOOKS)
 @app.post("/simuler-evenement")
 def simuler_evenement(
@@ -415,7 +763,7 @@ def simuler_evenement(
         raise HTTPException(status_code=401, detail="Token d'authentification invalide")
     
     # Vérifier que le type d'événement est valide
-    types_valides = ["nouveau_personnage", "nouveau_score", "mise_a_jour_score", "test"]
+    types_valides = ["nouveau_personnage", "lot_personnages", "nouveau_score", "mise_a_jour_score", "lot_scores", "test"]
     if event_type not in types_valides:
         raise HTTPException(
             status_code=400, 
@@ -0,0 +1,57 @@
+import base64
+import bisect
+import json
+
+# Nombre maximum d'éléments par page
+LIMITE_MAX = 1000
+
+
+# Fonction pour encoder un curseur opaque à partir de la dernière clé d'une page
+def encoder_curseur(cle):
+    brut = json.dumps({"apres": cle}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(brut).decode("ascii").rstrip("=")
+
+
+# Fonction pour décoder un curseur (lève ValueError si le curseur est invalide).
+# Les clés paginées (id, personnage_id) sont des entiers : toute autre valeur est refusée.
+def decoder_curseur(curseur):
+    try:
+        brut = base64.urlsafe_b64decode(curseur + "=" * (-len(curseur) % 4))
+        cle = json.loads(brut)["apres"]
+    except Exception:
+        raise ValueError(f"Curseur invalide: {curseur}")
+    if not isinstance(cle, int) or isinstance(cle, bool):
+        raise ValueError(f"Curseur invalide: {curseur}")
+    return cle
+
+
+def paginer(cles_triees, limite=None, decalage=0, apres=None):
+    """
+    Découpe une liste de clés triées.
+    Avec un curseur (apres), la page commence juste après cette clé (pagination par clé),
+    sinon elle commence à l'indice decalage.
+    Retourne (clés de la page, clé de la page suivante ou None).
+    """
+    debut = bisect.bisect_right(cles_triees, apres) if apres is not None else 0
+    debut += decalage
+    if limite is None:
+        return cles_triees[debut:], None
+    fin = debut + limite
+    cles_page = cles_triees[debut:fin]
+    suivante = cles_page[-1] if fin < len(cles_triees) and cles_page else None
+    return cles_page, suivante
+
+
+# Fonction pour analyser le paramètre fields ("id,prenom,equipe")
+def analyser_champs(fields):
+    if not fields:
+        return None
+    champs = [champ.strip() for champ in fields.split(",") if champ.strip()]
+    return champs or None
+
+
+# Fonction pour ne garder que les champs demandés d'un élément
+def projeter(element, champs):
+    if champs is None:
+        return element
+    return {champ: element[champ] for champ in champs if champ in element}
@@ -0,0 +1,105 @@
+import bisect
+import threading
+import unicodedata
+
+# Taille des n-grammes de l'index
+TAILLE_NGRAMME = 3
+
+
+# Fonction pour normaliser un texte (minuscules, sans accents)
+def normaliser(texte):
+    if texte is None:
+        return ""
+    decompose = unicodedata.normalize("NFKD", str(texte).casefold())
+    return "".join(c for c in decompose if not unicodedata.combining(c))
+
+
+# Fonction pour découper un texte normalisé en n-grammes
+def ngrammes(texte):
+    return {texte[i:i + TAILLE_NGRAMME] for i in range(len(texte) - TAILLE_NGRAMME + 1)}
+
+
+class IndexTexte:
+    """
+    Index de recherche sur un champ texte (ex: "prenom").
+    Les valeurs sont normalisées puis indexées par trigrammes (recherche "contient")
+    et gardées triées (recherche par préfixe). Seules les valeurs candidates sont vérifiées.
+    """
+
+    def __init__(self, champ, cle="id"):
+        self.champ = champ
+        self.cle = cle
+        # Valeur normalisée -> clés des éléments ayant cette valeur
+        self._cles_par_valeur = {}
+        # Trigramme -> valeurs normalisées le contenant
+        self._valeurs_par_ngramme = {}
+        # Valeurs normalisées distinctes, triées
+        self._valeurs_triees = []
+        self._verrou = threading.Lock()
+
+    def _ajouter(self, valeur, cle):
+        cles = self._cles_par_valeur.get(valeur)
+        if cles is None:
+            cles = self._cles_par_valeur[valeur] = set()
+            bisect.insort(self._valeurs_triees, valeur)
+            for ngramme in ngrammes(valeur):
+                self._valeurs_par_ngramme.setdefault(ngramme, set()).add(valeur)
+        cles.add(cle)
+
+    def _retirer(self, valeur, cle):
+        cles = self._cles_par_valeur.get(valeur)
+        if cles is None:
+            return
+        cles.discard(cle)
+        if not cles:
+            del self._cles_par_valeur[valeur]
+            del self._valeurs_triees[bisect.bisect_left(self._valeurs_triees, valeur)]
+            for ngramme in ngrammes(valeur):
+                valeurs = self._valeurs_par_ngramme[ngramme]
+                valeurs.discard(valeur)
+                if not valeurs:
+                    del self._valeurs_par_ngramme[ngramme]
+
+    # Abonnement au dépôt
+    def element_modifie(self, ancien, nouveau):
+        with self._verrou:
+            if ancien is not None:
+                self._retirer(normaliser(ancien.get(self.champ)), ancien.get(self.cle))
+            if nouveau is not None:
+                self._ajouter(normaliser(nouveau.get(self.champ)), nouveau.get(self.cle))
+
+    def _valeurs_contenant(self, texte):
+        if len(texte) < TAILLE_NGRAMME:
+            # Requête trop courte pour l'index : on parcourt les valeurs distinctes
+            return [valeur for valeur in self._valeurs_triees if texte in valeur]
+        # Intersection des trigrammes, en commençant par le plus sélectif
+        ensembles = sorted(
+            (self._valeurs_par_ngramme.get(ngramme, set()) for ngramme in ngrammes(texte)),
+            key=len,
+        )
+        candidates = set(ensembles[0]).intersection(*ensembles[1:])
+        return [valeur for valeur in candidates if texte in valeur]
+
+    def _valeurs_commencant_par(self, texte):
+        debut = bisect.bisect_left(self._valeurs_triees, texte)
+        valeurs = []
+        for valeur in self._valeurs_triees[debut:]:
+            if not valeur.startswith(texte):
+                break
+            valeurs.append(valeur)
+        return valeurs
+
+    def rechercher(self, texte, prefixe=False):
+        """
+        Retourne l'ensemble des clés dont le champ contient (ou commence par) le texte
+        """
+        texte = normaliser(texte)
+        with self._verrou:
+            if prefixe:
+                valeurs = self._valeurs_commencant_par(texte)
+            else:
+                valeurs = self._valeurs_contenant(texte)
+            cles = set()
+            for valeur in valeurs:
+                cles.update(self._cles_par_valeur[valeur])
+        return cles
@@ -0,0 +1,167 @@
+import itertools
+import json
+import os
+import zlib
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+# orjson est optionnel : beaucoup plus rapide que json, il est utilisé s'il est installé
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# brotli est optionnel : sans lui, seule la compression gzip est proposée
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Fichiers de données indentés (lisibles) plutôt que compacts
+JSON_INDENTE = os.environ.get("MANGA_API_JSON_INDENTE", "0") == "1"
+
+# Nombre d'éléments par morceau dans les réponses envoyées au fil de l'eau
+TAILLE_MORCEAU_FLUX = int(os.environ.get("MANGA_API_TAILLE_MORCEAU_FLUX", "500"))
+
+# Taille (en octets) en dessous de laquelle les réponses ne sont pas compressées
+SEUIL_COMPRESSION = int(os.environ.get("MANGA_API_SEUIL_COMPRESSION", "1024"))
+NIVEAU_GZIP = 6
+
+
+# Fonction pour encoder une valeur en JSON (octets UTF-8, format compact par défaut)
+def encoder(valeur, indente=False):
+    if orjson is not None:
+        options = orjson.OPT_NON_STR_KEYS
+        if indente:
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(valeur, option=options)
+    if indente:
+        return json.dumps(valeur, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(valeur, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# Fonction pour décoder du JSON (octets ou texte)
+def decoder(donnees):
+    if orjson is not None:
+        return orjson.loads(donnees)
+    return json.loads(donnees)
+
+
+class ReponseJSON(JSONResponse):
+    """
+    Réponse JSON encodée avec orjson quand il est disponible
+    """
+
+    def render(self, content):
+        return encoder(content)
+
+
+# Fonction pour choisir la compression acceptée par le client (en-tête Accept-Encoding)
+def choisir_compression(accept_encoding):
+    acceptes = {}
+    for partie in accept_encoding.split(","):
+        nom, _, parametre = partie.strip().partition(";")
+        parametre = parametre.strip()
+        try:
+            qualite = float(parametre[2:]) if parametre.startswith("q=") else 1.0
+        except ValueError:
+            qualite = 0.0
+        acceptes[nom.strip().lower()] = qualite
+    for compression in ("br", "gzip"):
+        if compression == "br" and brotli is None:
+            continue
+        if acceptes.get(compression, acceptes.get("*", 0.0)) > 0:
+            return compression
+    return None
+
+
+# Fonction pour découper des éléments encodés en morceaux de tableau JSON ou de NDJSON
+def _morceaux(elements_encodes, ndjson):
+    elements_encodes = iter(elements_encodes)
+    premier = True
+    while True:
+        morceau = list(itertools.islice(elements_encodes, TAILLE_MORCEAU_FLUX))
+        if ndjson:
+            if not morceau:
+                return
+            yield b"\n".join(morceau) + b"\n"
+            continue
+        if not morceau:
+            yield b"[]" if premier else b"]"
+            return
+        yield (b"[" if premier else b",") + b",".join(morceau)
+        premier = False
+
+
+def _compresser(morceaux, compression):
+    if compression == "br":
+        compresseur = brotli.Compressor()
+        for morceau in morceaux:
+            yield compresseur.process(morceau)
+        yield compresseur.finish()
+    else:
+        # wbits=31 : format gzip
+        compresseur = zlib.compressobj(NIVEAU_GZIP, zlib.DEFLATED, 31)
+        for morceau in morceaux:
+            compresse = compresseur.compress(morceau)
+            if compresse:
+                yield compresse
+        yield compresseur.flush()
+
+
+def reponse_liste(request: Request, elements_encodes):
+    """
+    Construit la réponse d'une liste à partir d'éléments déjà encodés (sans ré-encodage).
+    Tableau JSON, ou NDJSON si le client le demande dans l'en-tête Accept.
+    Les grandes listes sont envoyées par morceaux (la réponse n'est jamais construite en entier)
+    et compressées en gzip ou brotli selon l'en-tête Accept-Encoding.
+    """
+    accept = request.headers.get("accept", "")
+    ndjson = "application/x-ndjson" in accept or "application/ndjson" in accept
+    media_type = "application/x-ndjson" if ndjson else "application/json"
+    entetes = {"Vary": "Accept, Accept-Encoding"}
+    morceaux = _morceaux(elements_encodes, ndjson)
+
+    # Lire le début de la liste : une petite réponse est envoyée en une fois, sans compression
+    debut = []
+    taille = 0
+    for morceau in morceaux:
+        debut.append(morceau)
+        taille += len(morceau)
+        if taille >= SEUIL_COMPRESSION:
+            break
+    else:
+        return Response(content=b"".join(debut), media_type=media_type, headers=entetes)
+
+    flux = itertools.chain(debut, morceaux)
+    compression = choisir_compression(request.headers.get("accept-encoding", ""))
+    if compression is not None:
+        flux = _compresser(flux, compression)
+        entetes["Content-Encoding"] = compression
+    return StreamingResponse(flux, media_type=media_type, headers=entetes)
+
+
+class CacheOctets:
+    """
+    Octets JSON des éléments d'un dépôt, encodés à la première lecture.
+    L'entrée d'un élément est retirée à chaque modification de celui-ci ; comme les éléments
+    sont remplacés et jamais modifiés sur place, une entrée n'est utilisée que pour l'objet encodé.
+    """
+
+    def __init__(self, cle):
+        self.cle = cle
+        # Valeur de la clé -> (élément, octets)
+        self._entrees = {}
+
+    # Abonnement au dépôt
+    def element_modifie(self, ancien, nouveau):
+        if ancien is not None:
+            self._entrees.pop(ancien.get(self.cle), None)
+
+    def octets(self, element):
+        valeur_cle = element.get(self.cle)
+        entree = self._entrees.get(valeur_cle)
+        if entree is None or entree[0] is not element:
+            entree = self._entrees[valeur_cle] = (element, encoder(element))
+        return entree[1]
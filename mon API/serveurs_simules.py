@@ -0,0 +1,150 @@
+import asyncio
+import random
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+
+# Serveurs locaux qui imitent les API utilisées par l'ETL, pour le tester et mesurer
+# ses performances sans dépendre du réseau ni écrire de données.
+
+
+def organisations_page(page, par_page=25):
+    """
+    Organisations d'une page de l'API source simulée (toujours les mêmes pour une page donnée)
+    """
+    generateur = random.Random(page)
+    villes = ["Tokyo", "Osaka", "Paris", "Columbus", "Seattle"]
+    return [
+        {
+            "ein": 100000000 + page * par_page + i,
+            "name": f"Anime Society {page}-{i}",
+            "city": generateur.choice(villes),
+            "state": generateur.choice(["OH", "CA", "WA", "NY"]),
+            "totrevenue": generateur.choice([None, 0, generateur.randint(0, 2000000)]),
+        }
+        for i in range(par_page)
+    ]
+
+
+def application_source(pages=20, par_page=25, latence=0.0, taux_erreur=0.0):
+    """
+    API source paginée simulée (même format que la recherche ProPublica : num_pages, organizations).
+    Chaque requête attend `latence` secondes et échoue (503) avec la probabilité `taux_erreur`.
+    """
+    application = FastAPI(title="API source simulée")
+    application.state.requetes = 0
+    application.state.erreurs = 0
+
+    @application.get("/search.json")
+    async def rechercher(page: int = 0, q: str = ""):
+        application.state.requetes += 1
+        if latence:
+            await asyncio.sleep(latence)
+        if random.random() < taux_erreur:
+            application.state.erreurs += 1
+            return Response(status_code=503)
+        return {
+            "total_results": pages * par_page,
+            "num_pages": pages,
+            "cur_page": page,
+            "per_page": par_page,
+            "organizations": organisations_page(page, par_page) if 0 <= page < pages else [],
+        }
+
+    return application
+
+
+def application_cible(latence=0.0):
+    """
+    API cible simulée : mêmes endpoints d'import des personnages et d'envoi des scores
+    que l'API principale, avec une latence réglable par requête, sans stockage
+    """
+    application = FastAPI(title="API cible simulée")
+    application.state.requetes = 0
+
+    @application.post("/personnages/bulk")
+    async def importer_personnages(request: Request):
+        # Corps NDJSON : un personnage par ligne
+        nombre = sum(1 for ligne in (await request.body()).splitlines() if ligne.strip())
+        application.state.requetes += 1
+        if latence:
+            await asyncio.sleep(latence)
+        return {"status": "success", "compteurs": {"cree": nombre, "conflit": 0, "invalide": 0}, "erreurs": []}
+
+    @application.post("/personnages/scores", status_code=201)
+    async def ajouter_score(request: Request):
+        score = await request.json()
+        application.state.requetes += 1
+        if latence:
+            await asyncio.sleep(latence)
+        return {"status": "success", "message": f"Score ajouté pour {score.get('nom_complet')}"}
+
+    @application.post("/personnages/scores/batch")
+    async def ajouter_scores_lot(request: Request):
+        scores = await request.json()
+        application.state.requetes += 1
+        if latence:
+            await asyncio.sleep(latence)
+        return {
+            "compteurs": {"cree": len(scores), "mis_a_jour": 0, "non_trouve": 0, "invalide": 0},
+            "resultats": [
+                {"index": index, "personnage_id": score.get("personnage_id"), "statut": "cree"}
+                for index, score in enumerate(scores)
+            ],
+        }
+
+    return application
+
+
+class ServeurLocal:
+    """
+    Serveur uvicorn lancé dans un thread (port libre choisi par le système si port=0)
+    """
+
+    def __init__(self, application, port=0):
+        self.serveur = uvicorn.Server(uvicorn.Config(application, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = None
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.serveur.run, name="serveur-simule", daemon=True)
+        self.thread.start()
+        while not self.serveur.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("Le serveur simulé n'a pas pu démarrer")
+            time.sleep(0.01)
+        return self
+
+    @property
+    def url(self):
+        port = self.serveur.servers[0].sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    def __exit__(self, *exc):
+        self.serveur.should_exit = True
+        self.thread.join()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serveurs simulés pour tester l'ETL en local")
+    sous_commandes = parser.add_subparsers(dest="serveur", required=True)
+    source = sous_commandes.add_parser("source", help="API source paginée (extraction)")
+    source.add_argument("--port", type=int, default=8765)
+    source.add_argument("--pages", type=int, default=20, help="Nombre de pages")
+    source.add_argument("--par-page", type=int, default=25, help="Organisations par page")
+    source.add_argument("--latence", type=float, default=0.2, help="Latence ajoutée à chaque requête (secondes)")
+    source.add_argument("--taux-erreur", type=float, default=0.0,
+                        help="Proportion de requêtes en erreur 503 (entre 0 et 1)")
+    cible = sous_commandes.add_parser("cible", help="API cible (envoi des scores)")
+    cible.add_argument("--port", type=int, default=8000)
+    cible.add_argument("--latence", type=float, default=0.0, help="Latence ajoutée à chaque requête (secondes)")
+    args = parser.parse_args()
+
+    if args.serveur == "source":
+        application = application_source(args.pages, args.par_page, args.latence, args.taux_erreur)
+    else:
+        application = application_cible(args.latence)
+    uvicorn.run(application, host="127.0.0.1", port=args.port, log_level="warning")
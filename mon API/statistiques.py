@@ -0,0 +1,117 @@
+import math
+import threading
+
+# Champs de compétences d'un personnage
+CHAMPS_COMPETENCES = ("force", "technique", "vitesse", "endurance")
+
+
+class Agregat:
+    """
+    Compteurs et sommes d'un groupe (une équipe ou une position)
+    """
+
+    def __init__(self):
+        self.nombre = 0
+        # Nombre de personnages ayant des compétences et somme de chaque compétence
+        self.nombre_competences = 0
+        self.sommes_competences = dict.fromkeys(CHAMPS_COMPETENCES, 0)
+        # Nombre de scores, et nombre et somme des score_global finis (les valeurs infinies
+        # ou NaN rendraient la somme définitivement infinie ou NaN, même après leur retrait)
+        self.nombre_scores = 0
+        self.nombre_scores_finis = 0
+        self.somme_scores = 0.0
+
+    def est_vide(self):
+        return self.nombre == 0 and self.nombre_scores == 0
+
+    def moyennes(self):
+        moyennes = {}
+        for champ in CHAMPS_COMPETENCES:
+            moyennes[champ] = (
+                round(self.sommes_competences[champ] / self.nombre_competences, 2)
+                if self.nombre_competences else None
+            )
+        moyennes["score_global"] = (
+            round(self.somme_scores / self.nombre_scores_finis, 2) if self.nombre_scores_finis else None
+        )
+        return moyennes
+
+
+class StatistiquesGroupe:
+    """
+    Statistiques par valeur d'un champ (ex: "equipe"), mises à jour à chaque
+    création, modification ou suppression au lieu d'être recalculées à chaque requête
+    """
+
+    def __init__(self, champ):
+        self.champ = champ
+        self.total_personnages = 0
+        self._groupes = {}
+        self._verrou = threading.Lock()
+
+    def _groupe(self, valeur):
+        agregat = self._groupes.get(valeur)
+        if agregat is None:
+            agregat = self._groupes[valeur] = Agregat()
+        return agregat
+
+    def _nettoyer(self, valeur):
+        agregat = self._groupes.get(valeur)
+        if agregat is not None and agregat.est_vide():
+            del self._groupes[valeur]
+
+    def _appliquer_personnage(self, personnage, signe):
+        valeur = personnage.get(self.champ)
+        agregat = self._groupe(valeur)
+        agregat.nombre += signe
+        self.total_personnages += signe
+        competences = personnage.get("competences")
+        if isinstance(competences, dict):
+            agregat.nombre_competences += signe
+            for champ in CHAMPS_COMPETENCES:
+                agregat.sommes_competences[champ] += signe * (competences.get(champ) or 0)
+        self._nettoyer(valeur)
+
+    def _appliquer_score(self, score, signe):
+        valeur = score.get(self.champ)
+        agregat = self._groupe(valeur)
+        agregat.nombre_scores += signe
+        score_global = score.get("score_global") or 0
+        if isinstance(score_global, (int, float)) and math.isfinite(score_global):
+            agregat.nombre_scores_finis += signe
+            agregat.somme_scores += signe * score_global
+        self._nettoyer(valeur)
+
+    # Abonnement au dépôt des personnages
+    def personnage_modifie(self, ancien, nouveau):
+        with self._verrou:
+            if ancien is not None:
+                self._appliquer_personnage(ancien, -1)
+            if nouveau is not None:
+                self._appliquer_personnage(nouveau, 1)
+
+    # Abonnement au dépôt des scores
+    def score_modifie(self, ancien, nouveau):
+        with self._verrou:
+            if ancien is not None:
+                self._appliquer_score(ancien, -1)
+            if nouveau is not None:
+                self._appliquer_score(nouveau, 1)
+
+    def distribution(self):
+        """
+        Nombre de personnages par valeur du champ
+        """
+        with self._verrou:
+            return {
+                valeur: agregat.nombre
+                for valeur, agregat in self._groupes.items()
+                if agregat.nombre > 0
+            }
+
+    def moyennes(self):
+        """
+        Moyenne de chaque compétence et du score_global par valeur du champ
+        """
+        with self._verrou:
+            return {valeur: agregat.moyennes() for valeur, agregat in self._groupes.items()}
@@ -0,0 +1,943 @@
+import atexit
+import bisect
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from classement import Classements
+from colonnes import MoteurColonnes, PERCENTILES_DEFAUT, np
+from pagination import paginer
+from recherche import IndexTexte
+from serialisation import CacheOctets, JSON_INDENTE, decoder, encoder
+from statistiques import StatistiquesGroupe
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrous de fichiers, un seul processus possible
+    fcntl = None
+
+# Intervalle (en secondes) entre deux sauvegardes en arrière-plan.
+# Une valeur <= 0 désactive l'écriture différée : chaque modification est écrite immédiatement.
+INTERVALLE_SAUVEGARDE = float(os.environ.get("MANGA_API_INTERVALLE_SAUVEGARDE", "1.0"))
+
+# Plusieurs processus (uvicorn --workers N) partagent les fichiers : les écritures sont
+# faites sous un verrou de fichier et chaque processus recharge les modifications des autres.
+MULTI_PROCESSUS = os.environ.get("MANGA_API_MULTI_PROCESSUS", "0") == "1"
+
+# Taille (en octets) au-delà de laquelle un journal est compacté dans un nouvel instantané
+TAILLE_MAX_JOURNAL = int(os.environ.get("MANGA_API_TAILLE_MAX_JOURNAL", str(4 * 1024 * 1024)))
+
+# Forcer l'écriture physique (fsync) du journal à chaque modification
+JOURNAL_FSYNC = os.environ.get("MANGA_API_JOURNAL_FSYNC", "1") != "0"
+
+# Champs des personnages sur lesquels la recherche texte est possible
+CHAMPS_RECHERCHE = ("prenom", "nom", "equipe", "position")
+
+
+# Masque de création des fichiers du processus (os.umask ne permet que de le lire en le remplaçant)
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def _mode_fichier(chemin):
+    # Droits du fichier remplacé, ou droits par défaut d'un nouveau fichier (mkstemp crée en 0600)
+    try:
+        return os.stat(chemin).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~UMASK
+
+
+# Fonction pour écrire un fichier JSON de manière atomique (fichier temporaire + renommage).
+# Le fichier est compact, sauf si MANGA_API_JSON_INDENTE=1.
+def ecrire_json_atomique(chemin, donnees, indente=JSON_INDENTE):
+    dossier = os.path.dirname(os.path.abspath(chemin))
+    descripteur, chemin_temporaire = tempfile.mkstemp(dir=dossier, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(descripteur, "wb") as fichier:
+            if hasattr(os, "fchmod"):
+                os.fchmod(fichier.fileno(), _mode_fichier(chemin))
+            fichier.write(encoder(donnees, indente))
+            fichier.flush()
+            os.fsync(fichier.fileno())
+        os.replace(chemin_temporaire, chemin)
+    except BaseException:
+        if os.path.exists(chemin_temporaire):
+            os.remove(chemin_temporaire)
+        raise
+
+
+class VerrouFichier:
+    """
+    Verrou consultatif (fcntl.flock) partagé entre les processus qui utilisent un même fichier,
+    associé à un numéro de séquence incrémenté à chaque modification.
+    Le numéro est stocké dans le fichier de verrou : le lire coûte un appel système,
+    sans relire les données.
+    """
+
+    def __init__(self, chemin):
+        if fcntl is None:
+            raise RuntimeError("Le mode multi-processus nécessite fcntl (non disponible sur ce système)")
+        self.chemin = chemin
+        self._descripteur = os.open(chemin, os.O_RDWR | os.O_CREAT, 0o644)
+        # Identifie le fichier : si le fichier de verrou est recréé, les numéros de séquence repartent de 0
+        self.identifiant = os.fstat(self._descripteur).st_ino
+        # flock est lié au descripteur : les threads d'un même processus passent d'abord par ce verrou
+        self._verrou = threading.RLock()
+        self._profondeur = 0
+
+    @contextmanager
+    def exclusif(self):
+        with self._verrou:
+            if self._profondeur == 0:
+                fcntl.flock(self._descripteur, fcntl.LOCK_EX)
+            self._profondeur += 1
+            try:
+                yield
+            finally:
+                self._profondeur -= 1
+                if self._profondeur == 0:
+                    fcntl.flock(self._descripteur, fcntl.LOCK_UN)
+
+    def sequence(self):
+        donnees = os.pread(self._descripteur, 8, 0)
+        return struct.unpack("<Q", donnees)[0] if len(donnees) == 8 else 0
+
+    def incrementer(self):
+        """
+        Signale une modification aux autres processus (à appeler avec le verrou exclusif)
+        """
+        sequence = self.sequence() + 1
+        os.pwrite(self._descripteur, struct.pack("<Q", sequence), 0)
+        return sequence
+
+
+class Depot:
+    """
+    Collection d'éléments chargée une seule fois depuis un fichier JSON.
+    Les éléments sont indexés par leur clé (dictionnaire cle -> élément) :
+    recherches, insertions et suppressions se font en temps constant.
+    Les modifications sont regroupées et écrites sur disque par un thread en arrière-plan.
+
+    En mode multi-processus, chaque modification est faite sous un verrou de fichier
+    et écrite immédiatement ; les autres processus rechargent la collection quand
+    le numéro de séquence a changé.
+    """
+
+    def __init__(self, chemin, cle, intervalle_sauvegarde=INTERVALLE_SAUVEGARDE, multi_processus=MULTI_PROCESSUS):
+        self.chemin = chemin
+        self.cle = cle
+        self.intervalle_sauvegarde = intervalle_sauvegarde
+        self._verrou = threading.RLock()
+        self._verrou_ecriture = threading.Lock()
+        self._verrou_fichier = VerrouFichier(chemin + ".lock") if multi_processus else None
+        # Numéro de séquence des données chargées (mode multi-processus)
+        self._sequence = 0
+        # Numéro de version incrémenté à chaque modification
+        self._version = 0
+        self._version_sauvegardee = 0
+        # Distingue les versions de ce chargement de celles d'un lancement précédent
+        self._generation = time.time_ns()
+        self._modifie_le = time.time()
+        self._arret = threading.Event()
+        self._thread = None
+        # Fonctions appelées à chaque modification : fonction(ancien, nouveau)
+        self._abonnes = []
+
+        with self._verrou_fichier.exclusif() if self._verrou_fichier else nullcontext():
+            # Index principal : valeur de la clé -> élément (l'ordre d'insertion est conservé)
+            self._elements = {element.get(cle): element for element in self._charger()}
+            # Clés triées, pour la pagination par curseur
+            self._cles_triees = sorted(self._elements)
+            self._apres_chargement()
+            if self._verrou_fichier is not None:
+                self._sequence = self._verrou_fichier.sequence()
+
+    def _charger(self):
+        if not os.path.exists(self.chemin):
+            # Créer un fichier vide avec une liste vide
+            ecrire_json_atomique(self.chemin, [])
+            return []
+
+        with open(self.chemin, "rb") as fichier:
+            return decoder(fichier.read())
+
+    def _apres_chargement(self):
+        pass
+
+    # --- Coordination entre processus ---
+
+    @contextmanager
+    def _acces_exclusif(self):
+        """
+        En mode multi-processus : verrou entre processus, puis prise en compte
+        des modifications faites par les autres processus
+        """
+        if self._verrou_fichier is None:
+            yield
+            return
+        with self._verrou_fichier.exclusif():
+            sequence = self._verrou_fichier.sequence()
+            if sequence != self._sequence:
+                self._recharger()
+                self._sequence = sequence
+            yield
+
+    def rafraichir(self):
+        """
+        En mode multi-processus, recharge les modifications des autres processus
+        si le numéro de séquence a changé
+        """
+        if self._verrou_fichier is None or self._verrou_fichier.sequence() == self._sequence:
+            return
+        with self._acces_exclusif():
+            pass
+
+    def _recharger(self):
+        with self._verrou:
+            anciens = self._elements
+            self._elements = {element.get(self.cle): element for element in self._charger()}
+            self._cles_triees = sorted(self._elements)
+            # Les abonnés (index, statistiques) ne reçoivent que les différences
+            for valeur_cle, ancien in anciens.items():
+                if valeur_cle not in self._elements:
+                    self._diffuser(ancien, None)
+            for valeur_cle, nouveau in self._elements.items():
+                ancien = anciens.get(valeur_cle)
+                if ancien != nouveau:
+                    self._diffuser(ancien, nouveau)
+
+    # --- Lectures ---
+
+    def lister(self):
+        """
+        Retourne une copie de la liste des éléments
+        """
+        self.rafraichir()
+        with self._verrou:
+            return list(self._elements.values())
+
+    def obtenir(self, valeur_cle):
+        """
+        Retourne l'élément dont la clé vaut valeur_cle, ou None
+        """
+        self.rafraichir()
+        return self._elements.get(valeur_cle)
+
+    def page(self, limite=None, decalage=0, apres=None, cles=None):
+        """
+        Retourne (éléments de la page triés par clé, clé de la page suivante ou None).
+        cles permet de paginer un sous-ensemble de clés déjà trié (ex: résultat d'un filtre).
+        """
+        self.rafraichir()
+        with self._verrou:
+            cles_page, suivante = paginer(
+                self._cles_triees if cles is None else cles, limite, decalage, apres
+            )
+            return [self._elements[cle] for cle in cles_page if cle in self._elements], suivante
+
+    def __contains__(self, valeur_cle):
+        self.rafraichir()
+        return valeur_cle in self._elements
+
+    def __len__(self):
+        self.rafraichir()
+        return len(self._elements)
+
+    def etat(self):
+        """
+        Retourne (version, date de dernière modification) de la collection.
+        La version change à chaque modification, y compris par un autre processus.
+        """
+        self.rafraichir()
+        if self._verrou_fichier is not None:
+            return f"{self._verrou_fichier.identifiant:x}-{self._sequence}", self._modifie_le
+        return f"{self._generation:x}-{self._version}", self._modifie_le
+
+    def abonner(self, fonction):
+        """
+        Enregistre une fonction appelée avec (ancien, nouveau) à chaque modification.
+        Les éléments déjà présents lui sont transmis comme des insertions.
+        """
+        self.rafraichir()
+        with self._verrou:
+            for element in self._elements.values():
+                fonction(None, element)
+            self._abonnes.append(fonction)
+
+    def _notifier(self, ancien, nouveau):
+        self._journaliser(ancien, nouveau)
+        self._diffuser(ancien, nouveau)
+
+    def _journaliser(self, ancien, nouveau):
+        pass
+
+    def _diffuser(self, ancien, nouveau):
+        self._modifie_le = time.time()
+        for fonction in self._abonnes:
+            fonction(ancien, nouveau)
+
+    # --- Écritures ---
+
+    def inserer(self, element):
+        """
+        Ajoute un élément. Retourne False si la clé existe déjà.
+        """
+        valeur_cle = element[self.cle]
+        with self._acces_exclusif():
+            with self._verrou:
+                if valeur_cle in self._elements:
+                    return False
+                self._elements[valeur_cle] = element
+                bisect.insort(self._cles_triees, valeur_cle)
+                self._version += 1
+                self._notifier(None, element)
+            self._apres_modification()
+        return True
+
+    def upsert(self, element):
+        """
+        Ajoute ou remplace un élément. Retourne l'ancien élément (ou None).
+        """
+        with self._acces_exclusif():
+            with self._verrou:
+                ancien = self._elements.get(element[self.cle])
+                self._elements[element[self.cle]] = element
+                if ancien is None:
+                    bisect.insort(self._cles_triees, element[self.cle])
+                self._version += 1
+                self._notifier(ancien, element)
+            self._apres_modification()
+        return ancien
+
+    def inserer_lot(self, elements):
+        """
+        Ajoute plusieurs éléments avec une seule sauvegarde.
+        Retourne, pour chaque élément, True s'il a été ajouté ou False si sa clé existait déjà.
+        """
+        ajouts = []
+        with self._acces_exclusif():
+            with self._verrou:
+                for element in elements:
+                    valeur_cle = element[self.cle]
+                    if valeur_cle in self._elements:
+                        ajouts.append(False)
+                        continue
+                    self._elements[valeur_cle] = element
+                    bisect.insort(self._cles_triees, valeur_cle)
+                    self._notifier(None, element)
+                    ajouts.append(True)
+                if any(ajouts):
+                    self._version += 1
+            if any(ajouts):
+                self._apres_modification()
+        return ajouts
+
+    def upsert_lot(self, elements):
+        """
+        Ajoute ou remplace plusieurs éléments avec une seule sauvegarde.
+        Retourne la liste des anciens éléments (None pour une création).
+        """
+        anciens = []
+        with self._acces_exclusif():
+            with self._verrou:
+                for element in elements:
+                    valeur_cle = element[self.cle]
+                    ancien = self._elements.get(valeur_cle)
+                    self._elements[valeur_cle] = element
+                    if ancien is None:
+                        bisect.insort(self._cles_triees, valeur_cle)
+                    self._notifier(ancien, element)
+                    anciens.append(ancien)
+                if elements:
+                    self._version += 1
+            if elements:
+                self._apres_modification()
+        return anciens
+
+    def supprimer(self, valeur_cle):
+        """
+        Supprime un élément. Retourne l'élément supprimé (ou None).
+        """
+        with self._acces_exclusif():
+            with self._verrou:
+                ancien = self._elements.pop(valeur_cle, None)
+                if ancien is None:
+                    return None
+                del self._cles_triees[bisect.bisect_left(self._cles_triees, valeur_cle)]
+                self._version += 1
+                self._notifier(ancien, None)
+            self._apres_modification()
+        return ancien
+
+    # --- Persistance ---
+
+    def _apres_modification(self):
+        if self._verrou_fichier is not None:
+            # Écriture immédiate (sous le verrou de fichier), puis signal aux autres processus
+            self.sauvegarder()
+            self._sequence = self._verrou_fichier.incrementer()
+        elif self._thread is None:
+            # Sans thread d'arrière-plan, on écrit immédiatement (hors du verrou de lecture)
+            self.sauvegarder()
+
+    def sauvegarder(self):
+        """
+        Écrit la collection sur disque si elle a été modifiée depuis la dernière sauvegarde
+        """
+        # Une seule écriture à la fois, pour ne jamais remplacer un fichier récent par un plus ancien
+        with self._verrou_ecriture:
+            with self._verrou:
+                if self._version == self._version_sauvegardee:
+                    return
+                version = self._version
+                # Les éléments sont remplacés et jamais modifiés sur place :
+                # une copie superficielle suffit pour écrire hors du verrou.
+                instantane = list(self._elements.values())
+
+            ecrire_json_atomique(self.chemin, instantane)
+            self._version_sauvegardee = version
+
+    def _boucle_sauvegarde(self):
+        while not self._arret.wait(self.intervalle_sauvegarde):
+            try:
+                self.sauvegarder()
+            except Exception as e:
+                print(f"Erreur lors de la sauvegarde de {self.chemin}: {str(e)}")
+
+    def demarrer(self):
+        """
+        Démarre la sauvegarde en arrière-plan (si l'intervalle est positif).
+        En mode multi-processus, les écritures sont toujours immédiates.
+        """
+        if self.intervalle_sauvegarde <= 0 or self._thread is not None or self._verrou_fichier is not None:
+            return
+        self._arret.clear()
+        self._thread = threading.Thread(
+            target=self._boucle_sauvegarde,
+            name=f"sauvegarde-{os.path.basename(self.chemin)}",
+            daemon=True,
+        )
+        self._thread.start()
+        # Garantir une dernière sauvegarde même si l'arrêt n'est pas propre
+        atexit.register(self.arreter)
+
+    def arreter(self):
+        """
+        Arrête la sauvegarde en arrière-plan et écrit les dernières modifications
+        """
+        thread = self._thread
+        if thread is not None:
+            self._arret.set()
+            thread.join()
+            self._thread = None
+        self.sauvegarder()
+
+
+def chemins_journaux(chemin):
+    """
+    Chemins du journal d'un DepotJournalise et du journal mis de côté pendant une compaction
+    """
+    base = os.path.splitext(chemin)[0]
+    return base + ".journal.ndjson", base + ".journal.compaction.ndjson"
+
+
+def lire_journalise(chemin, cle):
+    """
+    Éléments d'un DepotJournalise (dernier instantané et journaux rejoués), lus sans rien
+    modifier : aucun fichier n'est créé, tronqué ni compacté (ex: migration des données)
+    """
+    elements = {}
+    if os.path.exists(chemin):
+        with open(chemin, "rb") as fichier:
+            elements = {element.get(cle): element for element in decoder(fichier.read())}
+
+    def appliquer(operation):
+        if operation["op"] == "upsert":
+            elements[operation["element"].get(cle)] = operation["element"]
+        else:
+            elements.pop(operation["cle"], None)
+
+    for chemin_journal in reversed(chemins_journaux(chemin)):
+        DepotJournalise._rejouer(chemin_journal, appliquer, tronquer=False)
+    return list(elements.values())
+
+
+class DepotJournalise(Depot):
+    """
+    Dépôt dont les modifications sont ajoutées à un journal NDJSON (une ligne par
+    modification) au lieu de réécrire tout le fichier : une écriture coûte O(élément).
+    Au démarrage, le journal est rejoué sur le dernier instantané (le fichier JSON).
+    Quand le journal dépasse TAILLE_MAX_JOURNAL, il est compacté en arrière-plan
+    dans un nouvel instantané.
+    En mode multi-processus, les autres processus ne relisent que la fin du journal.
+    """
+
+    def __init__(self, chemin, cle, intervalle_sauvegarde=INTERVALLE_SAUVEGARDE,
+                 taille_max_journal=TAILLE_MAX_JOURNAL, multi_processus=MULTI_PROCESSUS):
+        # Journal, et journal mis de côté pendant une compaction (rejoué si le serveur s'est arrêté entre-temps)
+        self.chemin_journal, self.chemin_compaction = chemins_journaux(chemin)
+        self.taille_max_journal = taille_max_journal
+        self._verrou_journal = threading.Lock()
+        # Lignes en attente d'écriture, dans l'ordre des modifications
+        self._lignes_journal = []
+        self._journal = None
+        # Taille du journal déjà lue ou écrite par ce processus
+        self._taille_journal = 0
+        super().__init__(chemin, cle, intervalle_sauvegarde, multi_processus)
+
+    def _charger(self):
+        elements = {element.get(self.cle): element for element in super()._charger()}
+
+        def appliquer(operation):
+            if operation["op"] == "upsert":
+                elements[operation["element"].get(self.cle)] = operation["element"]
+            else:
+                elements.pop(operation["cle"], None)
+
+        self._rejouer(self.chemin_compaction, appliquer)
+        self._taille_journal = self._rejouer(self.chemin_journal, appliquer)
+        return list(elements.values())
+
+    def _apres_chargement(self):
+        # Une compaction interrompue : écrire l'instantané complet avant de supprimer les journaux
+        if os.path.exists(self.chemin_compaction):
+            ecrire_json_atomique(self.chemin, list(self._elements.values()))
+            os.remove(self.chemin_compaction)
+            open(self.chemin_journal, "w").close()
+        self._journal = open(self.chemin_journal, "ab")
+        self._taille_journal = self._journal.tell()
+
+    @staticmethod
+    def _rejouer(chemin, appliquer, debut=0, tronquer=True):
+        """
+        Applique les modifications d'un journal à partir de l'octet debut et retourne
+        la position atteinte. Le rejeu s'arrête à la première ligne incomplète ou
+        invalide (écriture interrompue), qui est retirée du fichier si tronquer est vrai.
+        """
+        if not os.path.exists(chemin):
+            return 0
+        taille_valide = debut
+        with open(chemin, "rb") as fichier:
+            fichier.seek(debut)
+            for ligne in fichier:
+                try:
+                    if not ligne.endswith(b"\n"):
+                        raise ValueError("ligne incomplète")
+                    operation = decoder(ligne)
+                    if operation["op"] not in ("upsert", "supprimer"):
+                        raise ValueError(f"opération inconnue {operation['op']}")
+                    appliquer(operation)
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    action = "tronqué à" if tronquer else "ignoré à partir de"
+                    print(f"Journal {chemin} {action} l'octet {taille_valide}: {str(e)}")
+                    break
+                taille_valide += len(ligne)
+        if tronquer and taille_valide < os.path.getsize(chemin):
+            os.truncate(chemin, taille_valide)
+        return taille_valide
+
+    def _recharger(self):
+        journal_actuel = os.path.exists(self.chemin_journal) and (
+            os.stat(self.chemin_journal).st_ino == os.fstat(self._journal.fileno()).st_ino
+        )
+        if not journal_actuel:
+            # Journal compacté par un autre processus : rechargement complet
+            self._journal.close()
+            super()._recharger()
+            self._journal = open(self.chemin_journal, "ab")
+            self._taille_journal = self._journal.tell()
+            return
+
+        # Même journal : seules les lignes ajoutées par les autres processus sont lues
+        def appliquer(operation):
+            if operation["op"] == "upsert":
+                nouveau = operation["element"]
+                valeur_cle = nouveau.get(self.cle)
+                ancien = self._elements.get(valeur_cle)
+                self._elements[valeur_cle] = nouveau
+                if ancien is None:
+                    bisect.insort(self._cles_triees, valeur_cle)
+                self._diffuser(ancien, nouveau)
+            else:
+                ancien = self._elements.pop(operation["cle"], None)
+                if ancien is not None:
+                    del self._cles_triees[bisect.bisect_left(self._cles_triees, operation["cle"])]
+                    self._diffuser(ancien, None)
+
+        with self._verrou:
+            self._taille_journal = self._rejouer(self.chemin_journal, appliquer, self._taille_journal)
+
+    # Chaque modification passe par _journaliser (sous le verrou) : l'ordre du journal est celui des modifications
+    def _journaliser(self, ancien, nouveau):
+        if nouveau is not None:
+            operation = {"op": "upsert", "element": nouveau}
+        else:
+            operation = {"op": "supprimer", "cle": ancien[self.cle]}
+        self._lignes_journal.append(encoder(operation) + b"\n")
+
+    def _ecrire_journal(self):
+        # Appelé avec _verrou_journal : les lignes de plusieurs requêtes sont écrites ensemble
+        with self._verrou:
+            lignes, self._lignes_journal = self._lignes_journal, []
+        if not lignes:
+            return
+        self._journal.write(b"".join(lignes))
+        self._journal.flush()
+        if JOURNAL_FSYNC:
+            os.fsync(self._journal.fileno())
+        self._taille_journal = self._journal.tell()
+
+    def _apres_modification(self):
+        # La modification est durable dès que sa ligne est dans le journal
+        with self._verrou_journal:
+            self._ecrire_journal()
+        if self._verrou_fichier is not None:
+            self._sequence = self._verrou_fichier.incrementer()
+        # Sans thread d'arrière-plan, la compaction est faite immédiatement
+        if self._thread is None and self._taille_journal >= self.taille_max_journal:
+            self.compacter()
+
+    def compacter(self):
+        """
+        Écrit un nouvel instantané et repart d'un journal vide
+        """
+        with self._acces_exclusif(), self._verrou_ecriture:
+            with self._verrou_journal:
+                self._ecrire_journal()
+                if self._taille_journal == 0:
+                    return
+                with self._verrou:
+                    instantane = list(self._elements.values())
+                    version = self._version
+                # Les nouvelles modifications vont dans un nouveau journal pendant l'écriture de l'instantané
+                self._journal.close()
+                os.replace(self.chemin_journal, self.chemin_compaction)
+                self._journal = open(self.chemin_journal, "ab")
+                self._taille_journal = 0
+
+            ecrire_json_atomique(self.chemin, instantane)
+            os.remove(self.chemin_compaction)
+            self._version_sauvegardee = version
+            # Les autres processus doivent rouvrir le nouveau journal
+            if self._verrou_fichier is not None:
+                self._sequence = self._verrou_fichier.incrementer()
+
+    def sauvegarder(self):
+        """
+        Compacte le journal s'il contient des modifications
+        """
+        self.compacter()
+
+    def _boucle_sauvegarde(self):
+        while not self._arret.wait(self.intervalle_sauvegarde):
+            if self._taille_journal < self.taille_max_journal:
+                continue
+            try:
+                self.compacter()
+            except Exception as e:
+                print(f"Erreur lors de la compaction de {self.chemin_journal}: {str(e)}")
+
+
+class StockageJSON:
+    """
+    Stockage par défaut : personnages, scores et webhooks dans des fichiers JSON,
+    servis depuis la mémoire avec des index (clé, recherche texte) et des
+    statistiques tenus à jour à chaque modification.
+    """
+
+    def __init__(self, chemin_personnages, chemin_scores, chemin_webhooks,
+                 intervalle_sauvegarde=INTERVALLE_SAUVEGARDE, multi_processus=MULTI_PROCESSUS):
+        self.personnages = Depot(chemin_personnages, "id", intervalle_sauvegarde, multi_processus)
+        # Les scores sont modifiés souvent : journal des modifications plutôt que réécriture du fichier
+        self.scores = DepotJournalise(
+            chemin_scores, "personnage_id", intervalle_sauvegarde, multi_processus=multi_processus
+        )
+        self.webhooks = Depot(chemin_webhooks, "url", intervalle_sauvegarde, multi_processus)
+        self.depots = [self.personnages, self.scores, self.webhooks]
+
+        # Statistiques par équipe et par position
+        self.stats = {champ: StatistiquesGroupe(champ) for champ in ("equipe", "position")}
+        for stats in self.stats.values():
+            self.personnages.abonner(stats.personnage_modifie)
+            self.scores.abonner(stats.score_modifie)
+
+        # Index de recherche sur les champs texte des personnages
+        self.index_recherche = {champ: IndexTexte(champ) for champ in CHAMPS_RECHERCHE}
+        for index in self.index_recherche.values():
+            self.personnages.abonner(index.element_modifie)
+
+        # Octets JSON de chaque élément, pour répondre aux listes sans ré-encoder
+        self.octets_personnages = CacheOctets("id")
+        self.personnages.abonner(self.octets_personnages.element_modifie)
+        self.octets_scores = CacheOctets("personnage_id")
+        self.scores.abonner(self.octets_scores.element_modifie)
+
+        # Classements des scores (général, par équipe, par position)
+        self.classements = Classements()
+        self.scores.abonner(self.classements.score_modifie)
+
+        # Colonnes NumPy des compétences et des scores (statistiques vectorisées), si NumPy est installé
+        self.colonnes = None
+        if np is not None:
+            self.colonnes = MoteurColonnes()
+            self.personnages.abonner(self.colonnes.personnage_modifie)
+            self.scores.abonner(self.colonnes.score_modifie)
+
+    # --- Personnages ---
+
+    def etat(self, collection):
+        """
+        (version, date de dernière modification) de "personnages", "scores" ou "webhooks"
+        """
+        return {"personnages": self.personnages, "scores": self.scores, "webhooks": self.webhooks}[collection].etat()
+
+    def obtenir_personnage(self, id, encode=False):
+        personnage = self.personnages.obtenir(id)
+        if encode and personnage is not None:
+            return self.octets_personnages.octets(personnage)
+        return personnage
+
+    def personnage_existe(self, id):
+        return id in self.personnages
+
+    def inserer_personnage(self, personnage):
+        return self.personnages.inserer(personnage)
+
+    def inserer_personnages(self, personnages):
+        return self.personnages.inserer_lot(personnages)
+
+    def lister_personnages(self, filtres=None, prefixe=False, limite=None, decalage=0, apres=None, encodes=False):
+        """
+        Retourne (personnages de la page, nombre total de résultats, clé de la page suivante).
+        Avec encodes=True, les personnages sont retournés encodés en JSON (octets).
+        """
+        # Les index doivent refléter les modifications des autres processus
+        self.personnages.rafraichir()
+        # Filtrer avec les index de recherche si demandé
+        cles = None
+        for champ, texte in (filtres or {}).items():
+            if texte:
+                trouves = self.index_recherche[champ].rechercher(texte, prefixe)
+                cles = trouves if cles is None else cles & trouves
+        if cles is not None:
+            cles = sorted(cles)
+
+        personnages, cle_suivante = self.personnages.page(limite, decalage, apres, cles)
+        total = len(self.personnages) if cles is None else len(cles)
+        if encodes:
+            personnages = [self.octets_personnages.octets(p) for p in personnages]
+        return personnages, total, cle_suivante
+
+    def iterer_personnages(self, filtres=None, prefixe=False, decalage=0, apres=None, encodes=False):
+        """
+        Comme lister_personnages sans limite, mais les personnages sont encodés au fil
+        de l'itération. Retourne (nombre total de résultats, itérateur).
+        """
+        personnages, total, _ = self.lister_personnages(filtres, prefixe, None, decalage, apres)
+        if encodes:
+            return total, map(self.octets_personnages.octets, personnages)
+        return total, iter(personnages)
+
+    def statistiques(self, champ):
+        """
+        Statistiques par valeur de champ ("equipe" ou "position"), maintenues de manière incrémentale
+        """
+        self.personnages.rafraichir()
+        self.scores.rafraichir()
+        stats = self.stats[champ]
+        return {
+            "total_personnages": stats.total_personnages,
+            "distribution": stats.distribution(),
+            "moyennes": stats.moyennes()
+        }
+
+    def statistiques_competences(self, champ, percentiles=PERCENTILES_DEFAUT):
+        """
+        Moyenne, min, max et percentiles des compétences et des scores par valeur de champ,
+        calculés sur les colonnes NumPy (RuntimeError si NumPy n'est pas installé)
+        """
+        if self.colonnes is None:
+            raise RuntimeError("NumPy n'est pas installé")
+        self.personnages.rafraichir()
+        self.scores.rafraichir()
+        return self.colonnes.statistiques(champ, percentiles)
+
+    # --- Scores ---
+
+    def obtenir_score(self, personnage_id, encode=False):
+        score = self.scores.obtenir(personnage_id)
+        if encode and score is not None:
+            return self.octets_scores.octets(score)
+        return score
+
+    def upsert_score(self, score):
+        return self.scores.upsert(score)
+
+    def upsert_scores(self, scores):
+        return self.scores.upsert_lot(scores)
+
+    def lister_scores(self, limite=None, decalage=0, apres=None, encodes=False):
+        scores, cle_suivante = self.scores.page(limite, decalage, apres)
+        if encodes:
+            scores = [self.octets_scores.octets(s) for s in scores]
+        return scores, len(self.scores), cle_suivante
+
+    def iterer_scores(self, decalage=0, apres=None, encodes=False):
+        scores, total, _ = self.lister_scores(None, decalage, apres)
+        if encodes:
+            return total, map(self.octets_scores.octets, scores)
+        return total, iter(scores)
+
+    def meilleurs_scores(self, nombre, equipe=None, position=None, encodes=False):
+        """
+        Retourne (nombre meilleurs scores par score_global décroissant, nombre de scores classés),
+        éventuellement limités à une équipe et/ou une position
+        """
+        self.scores.rafraichir()
+        personnage_ids, total = self.classements.meilleurs(nombre, equipe, position)
+        scores = [self.scores.obtenir(personnage_id) for personnage_id in personnage_ids]
+        scores = [score for score in scores if score is not None]
+        if encodes:
+            scores = [self.octets_scores.octets(score) for score in scores]
+        return scores, total
+
+    def rang_score(self, personnage_id):
+        """
+        Rang du score d'un personnage : général, dans son équipe et dans sa position
+        (None si le personnage n'a pas de score classé)
+        """
+        self.scores.rafraichir()
+        return self.classements.rang(personnage_id)
+
+    # --- Webhooks ---
+
+    def lister_webhooks(self):
+        return self.webhooks.lister()
+
+    def inserer_webhook(self, webhook):
+        return self.webhooks.inserer(webhook)
+
+    def supprimer_webhook(self, url):
+        return self.webhooks.supprimer(url)
+
+    def abonner_webhooks(self, fonction):
+        self.webhooks.abonner(fonction)
+
+    def rafraichir_webhooks(self):
+        """
+        Transmet aux abonnés les webhooks ajoutés ou supprimés par les autres processus
+        """
+        self.webhooks.rafraichir()
+
+    # --- Cycle de vie ---
+
+    def demarrer(self):
+        for depot in self.depots:
+            depot.demarrer()
+
+    def arreter(self):
+        # Écrire les dernières modifications avant l'arrêt
+        for depot in self.depots:
+            depot.arreter()
+
+
+# --- Test de charge multi-processus : python stockage.py [processus] [ecritures] ---
+
+def _ecrire_depuis_processus(dossier, numero, nombre):
+    personnages = Depot(os.path.join(dossier, "personnages.json"), "id", 0, multi_processus=True)
+    # Petit journal, pour que les compactions se produisent pendant le test
+    scores = DepotJournalise(
+        os.path.join(dossier, "scores.json"), "personnage_id", 0, taille_max_journal=16 * 1024, multi_processus=True
+    )
+    for i in range(nombre):
+        personnages.inserer({"id": numero * nombre + i, "processus": numero})
+        scores.upsert({"personnage_id": numero * nombre + i, "processus": numero})
+        # Clés communes à tous les processus : la dernière écriture doit gagner, sans corruption
+        scores.upsert({"personnage_id": -(i % 10) - 1, "processus": numero})
+    scores.arreter()
+
+
+def verifier_multi_processus(processus=4, nombre=200):
+    """
+    Plusieurs processus écrivent en même temps dans les mêmes fichiers :
+    aucune écriture ne doit être perdue et chaque processus doit voir celles des autres.
+    """
+    import multiprocessing
+
+    with tempfile.TemporaryDirectory() as dossier:
+        # Dépôts ouverts avant les écritures : ils doivent se mettre à jour sans être recréés
+        personnages = Depot(os.path.join(dossier, "personnages.json"), "id", 0, multi_processus=True)
+        scores = DepotJournalise(os.path.join(dossier, "scores.json"), "personnage_id", 0, multi_processus=True)
+        stats_processus = StatistiquesGroupe("processus")
+        personnages.abonner(stats_processus.personnage_modifie)
+
+        with multiprocessing.Pool(processus) as pool:
+            pool.starmap(_ecrire_depuis_processus, [(dossier, numero, nombre) for numero in range(processus)])
+
+        attendus = processus * nombre
+        assert len(personnages) == attendus, f"{len(personnages)} personnages au lieu de {attendus}"
+        assert len(scores) == attendus + 10, f"{len(scores)} scores au lieu de {attendus + 10}"
+        assert stats_processus.total_personnages == attendus, "abonnés non prévenus des rechargements"
+
+        # Fichiers écrits avec les droits par défaut (et non ceux du fichier temporaire)
+        mode = os.stat(os.path.join(dossier, "personnages.json")).st_mode & 0o777
+        assert mode == 0o666 & ~UMASK, f"droits {oct(mode)} au lieu de {oct(0o666 & ~UMASK)}"
+
+        # Relecture depuis le disque par un nouveau processus
+        assert len(Depot(os.path.join(dossier, "personnages.json"), "id", 0)) == attendus
+        relus = DepotJournalise(os.path.join(dossier, "scores.json"), "personnage_id", 0)
+        assert len(relus) == attendus + 10
+        assert all(relus.obtenir(numero * nombre)["processus"] == numero for numero in range(processus))
+
+    print(f"✅ {processus} processus x {nombre} écritures : aucune écriture perdue")
+
+
+def mesurer_recherches(tailles=(1000, 10000, 100000, 1000000), operations=100000):
+    """
+    Durée moyenne d'une recherche par clé et d'un upsert (remplacement) selon la taille du dépôt :
+    avec l'index par clé, elle ne doit pas augmenter avec le nombre d'éléments.
+    """
+    import random
+
+    resultats = {}
+    with tempfile.TemporaryDirectory() as dossier:
+        for taille in tailles:
+            chemin = os.path.join(dossier, f"personnages_{taille}.json")
+            ecrire_json_atomique(chemin, [{"id": i, "nom": f"Personnage {i}"} for i in range(taille)])
+            # Intervalle de sauvegarde long : les écritures sur disque ne sont pas mesurées
+            depot = Depot(chemin, "id", intervalle_sauvegarde=3600, multi_processus=False)
+            depot.demarrer()
+            cles = [random.randrange(taille) for _ in range(operations)]
+
+            debut = time.perf_counter()
+            for cle in cles:
+                depot.obtenir(cle)
+            recherche = (time.perf_counter() - debut) / operations * 1e6
+
+            debut = time.perf_counter()
+            for cle in cles:
+                depot.upsert({"id": cle, "nom": "Modifié"})
+            modification = (time.perf_counter() - debut) / operations * 1e6
+
+            depot.arreter()
+            resultats[taille] = (recherche, modification)
+            print(f"{taille:>9} éléments : obtenir {recherche:.2f} µs, upsert {modification:.2f} µs")
+    return resultats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Vérifications du stockage JSON")
+    parser.add_argument("processus", type=int, nargs="?", default=4, help="Nombre de processus écrivains")
+    parser.add_argument("nombre", type=int, nargs="?", default=200, help="Nombre d'écritures par processus")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Mesurer la durée des recherches et des upserts de 1 000 à 1 000 000 éléments")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        mesurer_recherches()
+    else:
+        verifier_multi_processus(args.processus, args.nombre)
@@ -0,0 +1,630 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from colonnes import MoteurColonnes, PERCENTILES_DEFAUT, np
+from recherche import normaliser
+from serialisation import TAILLE_MORCEAU_FLUX, decoder, encoder
+from statistiques import CHAMPS_COMPETENCES
+from stockage import CHAMPS_RECHERCHE, lire_journalise
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS personnages (
+    id INTEGER PRIMARY KEY,
+    prenom_norm TEXT,
+    nom_norm TEXT,
+    equipe TEXT,
+    equipe_norm TEXT,
+    position TEXT,
+    position_norm TEXT,
+    force INTEGER,
+    technique INTEGER,
+    vitesse INTEGER,
+    endurance INTEGER,
+    donnees TEXT NOT NULL
+);
+-- Index couvrants : les statistiques par équipe/position sont calculées sans lire la table
+CREATE INDEX IF NOT EXISTS idx_personnages_equipe ON personnages (equipe, force, technique, vitesse, endurance);
+CREATE INDEX IF NOT EXISTS idx_personnages_position ON personnages (position, force, technique, vitesse, endurance);
+CREATE INDEX IF NOT EXISTS idx_personnages_prenom ON personnages (prenom_norm);
+
+CREATE TABLE IF NOT EXISTS scores (
+    personnage_id INTEGER PRIMARY KEY,
+    equipe TEXT,
+    position TEXT,
+    score_global REAL,
+    donnees TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scores_equipe ON scores (equipe, score_global);
+CREATE INDEX IF NOT EXISTS idx_scores_position ON scores (position, score_global);
+-- Classements par score_global décroissant (/personnages/scores/top)
+CREATE INDEX IF NOT EXISTS idx_scores_classement ON scores (score_global DESC);
+CREATE INDEX IF NOT EXISTS idx_scores_equipe_position ON scores (equipe, position, score_global DESC);
+
+CREATE TABLE IF NOT EXISTS webhooks (
+    url TEXT PRIMARY KEY,
+    donnees TEXT NOT NULL
+);
+
+-- Version de chaque collection, incrémentée dans la transaction de chaque modification (ETag)
+CREATE TABLE IF NOT EXISTS versions (
+    collection TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    modifie_le REAL NOT NULL
+);
+"""
+
+# Requêtes fréquentes (compilées une fois par connexion grâce au cache de requêtes de sqlite3)
+SQL_INSERER_PERSONNAGE = """
+INSERT OR IGNORE INTO personnages
+    (id, prenom_norm, nom_norm, equipe, equipe_norm, position, position_norm,
+     force, technique, vitesse, endurance, donnees)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+SQL_REMPLACER_PERSONNAGE = SQL_INSERER_PERSONNAGE.replace("INSERT OR IGNORE", "INSERT OR REPLACE")
+SQL_OBTENIR_PERSONNAGE = "SELECT donnees FROM personnages WHERE id = ?"
+SQL_PERSONNAGE_EXISTE = "SELECT 1 FROM personnages WHERE id = ?"
+SQL_UPSERT_SCORE = """
+INSERT INTO scores (personnage_id, equipe, position, score_global, donnees) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (personnage_id) DO UPDATE SET
+    equipe = excluded.equipe, position = excluded.position,
+    score_global = excluded.score_global, donnees = excluded.donnees
+"""
+SQL_OBTENIR_SCORE = "SELECT donnees FROM scores WHERE personnage_id = ?"
+SQL_INCREMENTER_VERSION = "UPDATE versions SET version = version + 1, modifie_le = ? WHERE collection = ?"
+SQL_OBTENIR_VERSION = "SELECT version, modifie_le FROM versions WHERE collection = ?"
+COLLECTIONS = ("personnages", "scores", "webhooks")
+
+
+def _json(element):
+    return encoder(element).decode("utf-8")
+
+
+def _ligne_personnage(personnage):
+    competences = personnage.get("competences")
+    if not isinstance(competences, dict):
+        competences = {}
+    return (
+        personnage["id"],
+        normaliser(personnage.get("prenom")),
+        normaliser(personnage.get("nom")),
+        personnage.get("equipe"),
+        normaliser(personnage.get("equipe")),
+        personnage.get("position"),
+        normaliser(personnage.get("position")),
+        *(competences.get(champ) for champ in CHAMPS_COMPETENCES),
+        _json(personnage),
+    )
+
+
+def _score_classable(valeur):
+    # Colonne score_global (classements, moyennes) : NULL si la valeur n'est pas un nombre fini
+    if not isinstance(valeur, (int, float)) or isinstance(valeur, bool):
+        return None
+    try:
+        return valeur if math.isfinite(valeur) else None
+    except OverflowError:  # entier trop grand pour un float
+        return None
+
+
+def _ligne_score(score):
+    return (
+        score["personnage_id"],
+        score.get("equipe"),
+        score.get("position"),
+        _score_classable(score.get("score_global")),
+        _json(score),
+    )
+
+
+class StockageSQLite:
+    """
+    Stockage alternatif dans une base SQLite (mode WAL), sûr avec plusieurs workers uvicorn.
+    Les recherches, la pagination et les statistiques sont faites en SQL, avec des index
+    sur id, personnage_id, equipe, position et prenom.
+    """
+
+    def __init__(self, chemin, chemins_json=None):
+        self.chemin = chemin
+        nouvelle_base = not os.path.exists(chemin)
+        self._local = threading.local()
+        self._verrou = threading.Lock()
+        self._connexions = []
+        self._abonnes_webhooks = []
+        # Webhooks déjà transmis aux abonnés (url -> webhook), et version de la table correspondante
+        self._webhooks_connus = {}
+        self._version_webhooks = None
+        # Colonnes NumPy, rechargées quand la version des personnages ou des scores a changé
+        self._colonnes = MoteurColonnes() if np is not None else None
+        self._versions_colonnes = None
+        self._verrou_colonnes = threading.Lock()
+
+        connexion = self._connexion()
+        connexion.execute("PRAGMA journal_mode=WAL")
+        connexion.executescript(SCHEMA)
+        connexion.executemany(
+            "INSERT OR IGNORE INTO versions (collection, version, modifie_le) VALUES (?, 0, ?)",
+            [(collection, time.time()) for collection in COLLECTIONS],
+        )
+
+        # Première utilisation : reprendre les données des fichiers JSON existants
+        if nouvelle_base and chemins_json:
+            self.migrer_depuis_json(*chemins_json)
+
+    def _connexion(self):
+        """
+        Connexion propre au thread courant
+        """
+        connexion = getattr(self._local, "connexion", None)
+        if connexion is None:
+            connexion = sqlite3.connect(self.chemin, isolation_level=None, timeout=30, cached_statements=256)
+            connexion.execute("PRAGMA synchronous=NORMAL")
+            self._local.connexion = connexion
+            with self._verrou:
+                self._connexions.append(connexion)
+        return connexion
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE : le verrou d'écriture est pris dès le début (pas de mise à jour perdue entre workers)
+        connexion = self._connexion()
+        connexion.execute("BEGIN IMMEDIATE")
+        try:
+            yield connexion
+        except BaseException:
+            connexion.execute("ROLLBACK")
+            raise
+        connexion.execute("COMMIT")
+
+    def _modifie(self, connexion, *collections):
+        # À appeler dans la transaction de la modification
+        maintenant = time.time()
+        connexion.executemany(SQL_INCREMENTER_VERSION, [(maintenant, collection) for collection in collections])
+
+    def etat(self, collection):
+        """
+        (version, date de dernière modification) de "personnages", "scores" ou "webhooks"
+        """
+        version, modifie_le = self._connexion().execute(SQL_OBTENIR_VERSION, (collection,)).fetchone()
+        # La date distingue les versions de deux bases recréées
+        return f"{version}-{int(modifie_le * 1000):x}", modifie_le
+
+    def _un(self, requete, parametres=()):
+        ligne = self._connexion().execute(requete, parametres).fetchone()
+        return decoder(ligne[0]) if ligne else None
+
+    # --- Migration ---
+
+    def migrer_depuis_json(self, chemin_personnages, chemin_scores, chemin_webhooks):
+        """
+        Importe le contenu des fichiers JSON (les éléments existants sont remplacés).
+        Les scores sont lus comme par le stockage JSON : dernier instantané et journal des modifications.
+        """
+        def lire(chemin):
+            if not os.path.exists(chemin):
+                return []
+            with open(chemin, "rb") as fichier:
+                return decoder(fichier.read())
+
+        personnages = lire(chemin_personnages)
+        # Lecture seule : les fichiers JSON ne sont pas modifiés par la migration
+        scores = lire_journalise(chemin_scores, "personnage_id")
+        webhooks = lire(chemin_webhooks)
+        with self._transaction() as connexion:
+            connexion.executemany(SQL_REMPLACER_PERSONNAGE, [_ligne_personnage(p) for p in personnages])
+            connexion.executemany(SQL_UPSERT_SCORE, [_ligne_score(s) for s in scores])
+            connexion.executemany(
+                "INSERT OR REPLACE INTO webhooks (url, donnees) VALUES (?, ?)",
+                [(w["url"], _json(w)) for w in webhooks],
+            )
+            self._modifie(connexion, *COLLECTIONS)
+        return {"personnages": len(personnages), "scores": len(scores), "webhooks": len(webhooks)}
+
+    # --- Personnages ---
+
+    def obtenir_personnage(self, id, encode=False):
+        if encode:
+            ligne = self._connexion().execute(SQL_OBTENIR_PERSONNAGE, (id,)).fetchone()
+            return ligne[0].encode("utf-8") if ligne else None
+        return self._un(SQL_OBTENIR_PERSONNAGE, (id,))
+
+    def personnage_existe(self, id):
+        return self._connexion().execute(SQL_PERSONNAGE_EXISTE, (id,)).fetchone() is not None
+
+    def inserer_personnage(self, personnage):
+        return self.inserer_personnages([personnage])[0]
+
+    def inserer_personnages(self, personnages):
+        ajouts = []
+        with self._transaction() as connexion:
+            for personnage in personnages:
+                ajouts.append(connexion.execute(SQL_INSERER_PERSONNAGE, _ligne_personnage(personnage)).rowcount == 1)
+            if any(ajouts):
+                self._modifie(connexion, "personnages")
+        return ajouts
+
+    def lister_personnages(self, filtres=None, prefixe=False, limite=None, decalage=0, apres=None, encodes=False):
+        """
+        Retourne (personnages de la page, nombre total de résultats, clé de la page suivante).
+        Avec encodes=True, les personnages sont retournés encodés en JSON (octets), tels que stockés.
+        """
+        total, clause, parametres = self._filtrer_personnages(filtres, prefixe, apres)
+        return self._page_avec_total("personnages", "id", clause, parametres, limite, decalage, total, encodes)
+
+    def iterer_personnages(self, filtres=None, prefixe=False, decalage=0, apres=None, encodes=False):
+        """
+        Comme lister_personnages sans limite, mais les personnages sont lus par morceaux
+        au fil de l'itération. Retourne (nombre total de résultats, itérateur).
+        """
+        total, clause, parametres = self._filtrer_personnages(filtres, prefixe, apres)
+        return total, self._iterer("personnages", "id", clause, parametres, decalage, encodes)
+
+    def _filtrer_personnages(self, filtres, prefixe, apres):
+        # Retourne (nombre total de résultats, clause WHERE, paramètres)
+        conditions = []
+        parametres = []
+        for champ, texte in (filtres or {}).items():
+            if not texte or champ not in CHAMPS_RECHERCHE:
+                continue
+            texte = normaliser(texte)
+            if prefixe:
+                # Intervalle sur la colonne normalisée : utilise l'index
+                conditions.append(f"{champ}_norm >= ? AND {champ}_norm < ?")
+                parametres.extend([texte, texte + "\U0010ffff"])
+            else:
+                conditions.append(f"instr({champ}_norm, ?) > 0")
+                parametres.append(texte)
+        clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        (total,) = self._connexion().execute(f"SELECT COUNT(*) FROM personnages {clause}", parametres).fetchone()
+
+        if apres is not None:
+            conditions.append("id > ?")
+            parametres.append(apres)
+        clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return total, clause, parametres
+
+    def _iterer(self, table, cle, clause, parametres, decalage, encodes):
+        # Connexion dédiée : l'itération peut se poursuivre dans d'autres threads (réponse en flux)
+        connexion = sqlite3.connect(self.chemin, isolation_level=None, check_same_thread=False)
+        try:
+            curseur = connexion.execute(
+                f"SELECT donnees FROM {table} {clause} ORDER BY {cle} LIMIT -1 OFFSET ?", (*parametres, decalage)
+            )
+            while True:
+                lignes = curseur.fetchmany(TAILLE_MORCEAU_FLUX)
+                if not lignes:
+                    return
+                for (donnees,) in lignes:
+                    yield donnees.encode("utf-8") if encodes else decoder(donnees)
+        finally:
+            connexion.close()
+
+    def _page_avec_total(self, table, cle, clause, parametres, limite, decalage, total, encodes):
+        # Une ligne de plus que demandé pour savoir s'il existe une page suivante
+        lignes = self._connexion().execute(
+            f"SELECT {cle}, donnees FROM {table} {clause} ORDER BY {cle} LIMIT ? OFFSET ?",
+            (*parametres, -1 if limite is None else limite + 1, decalage),
+        ).fetchall()
+        cle_suivante = None
+        if limite is not None and len(lignes) > limite:
+            lignes = lignes[:limite]
+            cle_suivante = lignes[-1][0] if lignes else None
+        if encodes:
+            return [donnees.encode("utf-8") for _, donnees in lignes], total, cle_suivante
+        return [decoder(donnees) for _, donnees in lignes], total, cle_suivante
+
+    def statistiques(self, champ):
+        """
+        Statistiques par valeur de champ ("equipe" ou "position"), calculées en SQL
+        """
+        if champ not in ("equipe", "position"):
+            raise ValueError(f"Champ de statistiques inconnu: {champ}")
+        connexion = self._connexion()
+        colonnes = ", ".join(f"AVG({c})" for c in CHAMPS_COMPETENCES)
+        distribution = {}
+        moyennes = {}
+        total = 0
+        for valeur, nombre, *moyennes_competences in connexion.execute(
+            f"SELECT {champ}, COUNT(*), {colonnes} FROM personnages GROUP BY {champ}"
+        ):
+            total += nombre
+            distribution[valeur] = nombre
+            moyennes[valeur] = {
+                c: (round(m, 2) if m is not None else None)
+                for c, m in zip(CHAMPS_COMPETENCES, moyennes_competences)
+            }
+            moyennes[valeur]["score_global"] = None
+        for valeur, moyenne in connexion.execute(
+            f"SELECT {champ}, AVG(score_global) FROM scores GROUP BY {champ}"
+        ):
+            if valeur not in moyennes:
+                moyennes[valeur] = dict.fromkeys(CHAMPS_COMPETENCES)
+            moyennes[valeur]["score_global"] = round(moyenne, 2) if moyenne is not None else None
+        return {"total_personnages": total, "distribution": distribution, "moyennes": moyennes}
+
+    def statistiques_competences(self, champ, percentiles=PERCENTILES_DEFAUT):
+        """
+        Moyenne, min, max et percentiles des compétences et des scores par valeur de champ,
+        calculés sur des colonnes NumPy (RuntimeError si NumPy n'est pas installé).
+        Les colonnes sont relues depuis la base seulement après une modification.
+        """
+        if self._colonnes is None:
+            raise RuntimeError("NumPy n'est pas installé")
+        with self._verrou_colonnes:
+            connexion = self._connexion()
+            # Lecture des versions et des colonnes dans la même transaction (instantané cohérent)
+            connexion.execute("BEGIN")
+            try:
+                versions = (self.etat("personnages")[0], self.etat("scores")[0])
+                if versions != self._versions_colonnes:
+                    competences = ", ".join(CHAMPS_COMPETENCES)
+                    self._colonnes.charger(
+                        connexion.execute(f"SELECT id, equipe, position, {competences} FROM personnages").fetchall(),
+                        connexion.execute("SELECT personnage_id, equipe, position, score_global FROM scores").fetchall(),
+                    )
+                    self._versions_colonnes = versions
+            finally:
+                connexion.execute("COMMIT")
+        return self._colonnes.statistiques(champ, percentiles)
+
+    # --- Scores ---
+
+    def obtenir_score(self, personnage_id, encode=False):
+        if encode:
+            ligne = self._connexion().execute(SQL_OBTENIR_SCORE, (personnage_id,)).fetchone()
+            return ligne[0].encode("utf-8") if ligne else None
+        return self._un(SQL_OBTENIR_SCORE, (personnage_id,))
+
+    def upsert_score(self, score):
+        return self.upsert_scores([score])[0]
+
+    def upsert_scores(self, scores):
+        anciens = []
+        with self._transaction() as connexion:
+            for score in scores:
+                ligne = connexion.execute(SQL_OBTENIR_SCORE, (score["personnage_id"],)).fetchone()
+                anciens.append(decoder(ligne[0]) if ligne else None)
+            connexion.executemany(SQL_UPSERT_SCORE, [_ligne_score(score) for score in scores])
+            if scores:
+                self._modifie(connexion, "scores")
+        return anciens
+
+    def lister_scores(self, limite=None, decalage=0, apres=None, encodes=False):
+        (total,) = self._connexion().execute("SELECT COUNT(*) FROM scores").fetchone()
+        clause, parametres = ("WHERE personnage_id > ?", [apres]) if apres is not None else ("", [])
+        return self._page_avec_total("scores", "personnage_id", clause, parametres, limite, decalage, total, encodes)
+
+    def iterer_scores(self, decalage=0, apres=None, encodes=False):
+        (total,) = self._connexion().execute("SELECT COUNT(*) FROM scores").fetchone()
+        clause, parametres = ("WHERE personnage_id > ?", [apres]) if apres is not None else ("", [])
+        return total, self._iterer("scores", "personnage_id", clause, parametres, decalage, encodes)
+
+    def meilleurs_scores(self, nombre, equipe=None, position=None, encodes=False):
+        """
+        Retourne (nombre meilleurs scores par score_global décroissant, nombre de scores classés),
+        éventuellement limités à une équipe et/ou une position (lus dans l'ordre des index de classement)
+        """
+        conditions = ["score_global IS NOT NULL"]
+        parametres = []
+        for colonne, valeur in (("equipe", equipe), ("position", position)):
+            if valeur is not None:
+                conditions.append(f"{colonne} = ?")
+                parametres.append(valeur)
+        clause = " AND ".join(conditions)
+        connexion = self._connexion()
+        (total,) = connexion.execute(f"SELECT COUNT(*) FROM scores WHERE {clause}", parametres).fetchone()
+        lignes = connexion.execute(
+            f"SELECT donnees FROM scores WHERE {clause} ORDER BY score_global DESC, personnage_id LIMIT ?",
+            (*parametres, nombre),
+        ).fetchall()
+        if encodes:
+            return [donnees.encode("utf-8") for (donnees,) in lignes], total
+        return [decoder(donnees) for (donnees,) in lignes], total
+
+    def rang_score(self, personnage_id):
+        """
+        Rang du score d'un personnage : général, dans son équipe et dans sa position
+        (None si le personnage n'a pas de score classé)
+        """
+        connexion = self._connexion()
+        # Lectures dans la même transaction (instantané cohérent)
+        connexion.execute("BEGIN")
+        try:
+            ligne = connexion.execute(
+                "SELECT score_global, equipe, position FROM scores WHERE personnage_id = ? AND score_global IS NOT NULL",
+                (personnage_id,),
+            ).fetchone()
+            if ligne is None:
+                return None
+            score_global, equipe, position = ligne
+            resultat = {"score_global": score_global}
+            for nom, condition, parametres in (
+                ("general", "", ()), ("equipe", "equipe IS ? AND", (equipe,)), ("position", "position IS ? AND", (position,))
+            ):
+                (devant,) = connexion.execute(
+                    f"SELECT COUNT(*) FROM scores WHERE {condition}"
+                    " (score_global > ? OR (score_global = ? AND personnage_id < ?))",
+                    (*parametres, score_global, score_global, personnage_id),
+                ).fetchone()
+                (total,) = connexion.execute(
+                    f"SELECT COUNT(*) FROM scores WHERE {condition} score_global IS NOT NULL", parametres
+                ).fetchone()
+                resultat[nom] = {"rang": devant + 1, "total": total}
+            return resultat
+        finally:
+            connexion.execute("COMMIT")
+
+    # --- Webhooks ---
+
+    def lister_webhooks(self):
+        return [decoder(donnees) for (donnees,) in self._connexion().execute("SELECT donnees FROM webhooks")]
+
+    def inserer_webhook(self, webhook):
+        with self._transaction() as connexion:
+            ajoute = connexion.execute(
+                "INSERT OR IGNORE INTO webhooks (url, donnees) VALUES (?, ?)", (webhook["url"], _json(webhook))
+            ).rowcount == 1
+            if ajoute:
+                self._modifie(connexion, "webhooks")
+        if ajoute:
+            self.rafraichir_webhooks()
+        return ajoute
+
+    def supprimer_webhook(self, url):
+        with self._transaction() as connexion:
+            ligne = connexion.execute("SELECT donnees FROM webhooks WHERE url = ?", (url,)).fetchone()
+            if ligne is None:
+                return None
+            connexion.execute("DELETE FROM webhooks WHERE url = ?", (url,))
+            self._modifie(connexion, "webhooks")
+        self.rafraichir_webhooks()
+        return decoder(ligne[0])
+
+    def abonner_webhooks(self, fonction):
+        with self._verrou:
+            for webhook in self._webhooks_connus.values():
+                fonction(None, webhook)
+            self._abonnes_webhooks.append(fonction)
+        self.rafraichir_webhooks()
+
+    def rafraichir_webhooks(self):
+        """
+        Transmet aux abonnés les webhooks ajoutés ou supprimés depuis le dernier appel,
+        y compris par les autres processus
+        """
+        version, _ = self.etat("webhooks")
+        if version == self._version_webhooks:
+            return
+        webhooks = {webhook["url"]: webhook for webhook in self.lister_webhooks()}
+        with self._verrou:
+            self._version_webhooks = version
+            for url, ancien in list(self._webhooks_connus.items()):
+                if webhooks.get(url) != ancien:
+                    del self._webhooks_connus[url]
+                    for fonction in self._abonnes_webhooks:
+                        fonction(ancien, None)
+            for url, nouveau in webhooks.items():
+                if url not in self._webhooks_connus:
+                    self._webhooks_connus[url] = nouveau
+                    for fonction in self._abonnes_webhooks:
+                        fonction(None, nouveau)
+
+    # --- Cycle de vie ---
+
+    def demarrer(self):
+        pass
+
+    def arreter(self):
+        with self._verrou:
+            connexions, self._connexions = self._connexions, []
+        for connexion in connexions:
+            try:
+                connexion.close()
+            except sqlite3.ProgrammingError:
+                # Connexion créée par un autre thread : elle sera fermée à la fin du processus
+                pass
+        self._local = threading.local()
+
+
+def comparer_stockages(nombre=50000, operations=1000):
+    """
+    Compare les deux stockages sur les mêmes données (nombre personnages et scores) :
+    durée moyenne d'une lecture par id, d'une page, d'un filtre texte, des statistiques
+    et d'un upsert de score. Le stockage JSON est utilisé comme par l'API
+    (sauvegarde en arrière-plan, scores journalisés).
+    """
+    import random
+    import tempfile
+
+    from stockage import StockageJSON, ecrire_json_atomique
+
+    generateur = random.Random(0)
+    equipes = ["Nankatsu", "Toho", "Musashi", "Furano", "Hirado", "Meiwa"]
+    positions = ["Attaquant", "Milieu", "Défenseur", "Gardien"]
+    prenoms = ["Tsubasa", "Kojiro", "Genzo", "Taro", "Jun", "Hikaru", "Ken", "Shingo"]
+    personnages = [
+        {
+            "id": i,
+            "prenom": generateur.choice(prenoms),
+            "nom": f"Joueur{i}",
+            "equipe": generateur.choice(equipes),
+            "position": generateur.choice(positions),
+            "competences": {champ: generateur.randint(40, 99) for champ in CHAMPS_COMPETENCES},
+        }
+        for i in range(1, nombre + 1)
+    ]
+
+    def score(personnage):
+        return {
+            "personnage_id": personnage["id"],
+            "nom_complet": f"{personnage['prenom']} {personnage['nom']}",
+            "equipe": personnage["equipe"],
+            "position": personnage["position"],
+            "score_global": round(generateur.uniform(4, 10), 1),
+            "avis": "Évaluation",
+            "date_evaluation": "2025-05-07",
+            "forces": [],
+            "faiblesses": [],
+        }
+
+    ids = [generateur.randint(1, nombre) for _ in range(operations)]
+    mesures = {
+        "obtenir": lambda stockage, id: stockage.obtenir_personnage(id),
+        "page de 50": lambda stockage, id: stockage.lister_personnages(limite=50, apres=id),
+        "filtre texte": lambda stockage, id: stockage.lister_personnages({"prenom": prenoms[id % len(prenoms)][:3]}, limite=50),
+        "statistiques": lambda stockage, id: stockage.statistiques("equipe"),
+        "upsert score": lambda stockage, id: stockage.upsert_score(score(personnages[id - 1])),
+    }
+
+    resultats = {}
+    with tempfile.TemporaryDirectory() as dossier:
+        chemins_json = [os.path.join(dossier, nom) for nom in ("personnages.json", "scores.json", "webhooks.json")]
+        ecrire_json_atomique(chemins_json[0], personnages)
+        ecrire_json_atomique(chemins_json[1], [score(personnage) for personnage in personnages])
+        ecrire_json_atomique(chemins_json[2], [])
+
+        for nom, creer in (
+            ("json", lambda: StockageJSON(*chemins_json, multi_processus=False)),
+            ("sqlite", lambda: StockageSQLite(os.path.join(dossier, "manga.db"), chemins_json)),
+        ):
+            debut = time.perf_counter()
+            stockage = creer()
+            stockage.demarrer()
+            print(f"{nom}: chargement de {nombre} personnages et scores en {time.perf_counter() - debut:.2f} s")
+            resultats[nom] = {}
+            for operation, mesurer in mesures.items():
+                debut = time.perf_counter()
+                for id in ids:
+                    mesurer(stockage, id)
+                duree = (time.perf_counter() - debut) / operations * 1000
+                resultats[nom][operation] = duree
+                print(f"  {operation:<14} {duree:8.3f} ms")
+            stockage.arreter()
+    return resultats
+
+
+# Migration ponctuelle : python stockage_sqlite.py [base.db]
+# Comparaison des deux stockages : python stockage_sqlite.py --benchmark [nombre]
+if __name__ == "__main__":
+    import argparse
+
+    dossier = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Migration des fichiers JSON vers SQLite")
+    parser.add_argument("base", nargs="?", default=os.path.join(dossier, "manga.db"), help="Chemin de la base SQLite")
+    parser.add_argument("--benchmark", type=int, nargs="?", const=50000, metavar="NOMBRE",
+                        help="Comparer les stockages JSON et SQLite sur NOMBRE personnages (défaut : 50000)")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        comparer_stockages(args.benchmark)
+    else:
+        stockage = StockageSQLite(args.base)
+        compteurs = stockage.migrer_depuis_json(
+            os.path.join(dossier, "personnages.json"),
+            os.path.join(dossier, "scores.json"),
+            os.path.join(dossier, "webhooks.json"),
+        )
+        print(f"Migration vers {args.base} terminée: {compteurs}")
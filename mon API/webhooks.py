@@ -0,0 +1,673 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import requests
+
+# Nombre de livraisons de webhooks effectuées en parallèle
+WEBHOOKS_THREADS = int(os.environ.get("MANGA_API_WEBHOOKS_THREADS", "16"))
+# Nombre maximum de livraisons simultanées vers un même hôte
+WEBHOOKS_MAX_PAR_HOTE = int(os.environ.get("MANGA_API_WEBHOOKS_MAX_PAR_HOTE", "4"))
+# Timeout d'une livraison (en secondes)
+WEBHOOKS_TIMEOUT = 5
+# Nombre de tentatives avant de placer une livraison dans la liste des livraisons mortes
+WEBHOOKS_MAX_TENTATIVES = int(os.environ.get("MANGA_API_WEBHOOKS_MAX_TENTATIVES", "8"))
+# Délai de base (secondes) du backoff exponentiel entre deux tentatives, et délai maximum
+WEBHOOKS_BACKOFF_BASE = 2
+WEBHOOKS_BACKOFF_MAX = 3600
+# Nombre d'échecs consécutifs qui coupent un abonné, et durée de la coupure (secondes)
+WEBHOOKS_SEUIL_DISJONCTEUR = 5
+WEBHOOKS_DUREE_DISJONCTEUR = 30
+# Durée (secondes) de la réservation d'une livraison : passé ce délai, une livraison toujours
+# en cours (processus arrêté brutalement) est reprise par n'importe quel processus
+WEBHOOKS_DUREE_RESERVATION = 300
+
+
+class FileLivraisons:
+    """
+    File persistante (SQLite) des livraisons de webhooks en attente.
+    Ajouter une livraison est une simple insertion locale. Une livraison réservée
+    l'est pour WEBHOOKS_DUREE_RESERVATION secondes (colonne prochaine_tentative) :
+    si elle est interrompue par un arrêt brutal, elle est reprise à l'expiration
+    de la réservation, y compris par un autre processus.
+    """
+
+    def __init__(self, chemin):
+        self.chemin = chemin
+        self._verrou = threading.Lock()
+        self._connexion = sqlite3.connect(chemin, check_same_thread=False)
+        self._connexion.execute("PRAGMA journal_mode=WAL")
+        self._connexion.execute("PRAGMA synchronous=NORMAL")
+        self._connexion.execute(
+            """
+            CREATE TABLE IF NOT EXISTS livraisons (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                corps TEXT NOT NULL,
+                statut TEXT NOT NULL DEFAULT 'en_attente',
+                tentatives INTEGER NOT NULL DEFAULT 0,
+                prochaine_tentative REAL NOT NULL,
+                derniere_erreur TEXT,
+                cree_le REAL NOT NULL
+            )
+            """
+        )
+        self._connexion.execute(
+            "CREATE INDEX IF NOT EXISTS idx_livraisons_statut ON livraisons (statut, prochaine_tentative)"
+        )
+        self._connexion.commit()
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE : le verrou d'écriture SQLite est pris avant la lecture, si bien que
+        # deux processus (workers uvicorn) ne peuvent pas réserver ou regrouper les mêmes livraisons
+        with self._verrou:
+            self._connexion.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._connexion.rollback()
+                raise
+            self._connexion.commit()
+
+    def ajouter(self, livraisons, statut="en_attente"):
+        """
+        Ajoute des livraisons [(url, corps)] à la file.
+        Avec le statut "a_grouper", elles attendent d'être regroupées en une seule livraison.
+        """
+        maintenant = time.time()
+        with self._verrou:
+            self._connexion.executemany(
+                "INSERT INTO livraisons (url, corps, statut, prochaine_tentative, cree_le) VALUES (?, ?, ?, ?, ?)",
+                [(url, json.dumps(corps, ensure_ascii=False), statut, maintenant, maintenant) for url, corps in livraisons],
+            )
+            self._connexion.commit()
+
+    def groupes_en_attente(self):
+        """
+        Pour chaque URL ayant des événements à regrouper : (nombre d'événements, date du plus ancien)
+        """
+        with self._verrou:
+            lignes = self._connexion.execute(
+                "SELECT url, COUNT(*), MIN(cree_le) FROM livraisons WHERE statut = 'a_grouper' GROUP BY url"
+            ).fetchall()
+        return {url: (nombre, plus_ancien) for url, nombre, plus_ancien in lignes}
+
+    def grouper(self, url, limite, construire_corps):
+        """
+        Remplace les `limite` plus anciens événements à regrouper d'une URL
+        par une seule livraison, dont le corps est construit à partir de leurs corps
+        """
+        with self._transaction():
+            lignes = self._connexion.execute(
+                "SELECT id, corps FROM livraisons WHERE statut = 'a_grouper' AND url = ? ORDER BY id LIMIT ?",
+                (url, limite),
+            ).fetchall()
+            if not lignes:
+                return
+            corps = construire_corps([json.loads(corps) for _, corps in lignes])
+            maintenant = time.time()
+            self._connexion.execute(
+                "INSERT INTO livraisons (url, corps, prochaine_tentative, cree_le) VALUES (?, ?, ?, ?)",
+                (url, json.dumps(corps, ensure_ascii=False), maintenant, maintenant),
+            )
+            self._connexion.executemany("DELETE FROM livraisons WHERE id = ?", [(id,) for id, _ in lignes])
+
+    def reserver(self, limite, urls_exclues=(), accepter=None):
+        """
+        Marque comme en cours et retourne les livraisons arrivées à échéance
+        (sauf celles des URLs exclues et celles refusées par `accepter(url)`),
+        y compris celles dont la réservation a expiré (livraison au moins une fois).
+        Les livraisons refusées restent en file.
+        """
+        exclusion = ""
+        if urls_exclues:
+            exclusion = f"AND url NOT IN ({', '.join('?' * len(urls_exclues))})"
+        maintenant = time.time()
+        with self._transaction():
+            curseur = self._connexion.execute(
+                f"""
+                SELECT id, url, corps, tentatives FROM livraisons
+                WHERE statut IN ('en_attente', 'en_cours') AND prochaine_tentative <= ? {exclusion}
+                ORDER BY prochaine_tentative, id
+                """,
+                (maintenant, *urls_exclues),
+            )
+            lignes = []
+            for ligne in curseur:
+                if accepter is None or accepter(ligne[1]):
+                    lignes.append(ligne)
+                    if len(lignes) >= limite:
+                        break
+            curseur.close()
+            self._connexion.executemany(
+                "UPDATE livraisons SET statut = 'en_cours', prochaine_tentative = ? WHERE id = ?",
+                [(maintenant + WEBHOOKS_DUREE_RESERVATION, ligne[0]) for ligne in lignes]
+            )
+        return [
+            {"id": id, "url": url, "corps": json.loads(corps), "tentatives": tentatives}
+            for id, url, corps, tentatives in lignes
+        ]
+
+    def terminer(self, id):
+        with self._verrou:
+            self._connexion.execute("DELETE FROM livraisons WHERE id = ?", (id,))
+            self._connexion.commit()
+
+    def reporter(self, id, tentatives, prochaine_tentative, erreur):
+        with self._verrou:
+            self._connexion.execute(
+                """
+                UPDATE livraisons SET statut = 'en_attente', tentatives = ?, prochaine_tentative = ?, derniere_erreur = ?
+                WHERE id = ?
+                """,
+                (tentatives, prochaine_tentative, erreur, id),
+            )
+            self._connexion.commit()
+
+    def enterrer(self, id, tentatives, erreur):
+        """
+        Place une livraison dans la liste des livraisons mortes
+        """
+        with self._verrou:
+            self._connexion.execute(
+                "UPDATE livraisons SET statut = 'morte', tentatives = ?, derniere_erreur = ? WHERE id = ?",
+                (tentatives, erreur, id),
+            )
+            self._connexion.commit()
+
+    def prochaine_echeance(self, urls_exclues=()):
+        exclusion = ""
+        if urls_exclues:
+            exclusion = f"AND url NOT IN ({', '.join('?' * len(urls_exclues))})"
+        with self._verrou:
+            (echeance,) = self._connexion.execute(
+                f"SELECT MIN(prochaine_tentative) FROM livraisons WHERE statut IN ('en_attente', 'en_cours') {exclusion}",
+                tuple(urls_exclues),
+            ).fetchone()
+        return echeance
+
+    def compter(self):
+        """
+        Nombre de livraisons par statut
+        """
+        with self._verrou:
+            lignes = self._connexion.execute("SELECT statut, COUNT(*) FROM livraisons GROUP BY statut").fetchall()
+        compteurs = {"a_grouper": 0, "en_attente": 0, "en_cours": 0, "morte": 0}
+        compteurs.update(dict(lignes))
+        return compteurs
+
+    def lister_mortes(self, limite=100):
+        with self._verrou:
+            lignes = self._connexion.execute(
+                """
+                SELECT id, url, corps, tentatives, derniere_erreur, cree_le FROM livraisons
+                WHERE statut = 'morte' ORDER BY id LIMIT ?
+                """,
+                (limite,),
+            ).fetchall()
+        return [
+            {
+                "id": id,
+                "url": url,
+                "evenement": json.loads(corps),
+                "tentatives": tentatives,
+                "derniere_erreur": erreur,
+                "cree_le": datetime.fromtimestamp(cree_le).isoformat(),
+            }
+            for id, url, corps, tentatives, erreur, cree_le in lignes
+        ]
+
+    def rejouer(self, id=None):
+        """
+        Remet en file les livraisons mortes (toutes, ou seulement celle d'ID donné).
+        Retourne le nombre de livraisons remises en file.
+        """
+        requete = "UPDATE livraisons SET statut = 'en_attente', tentatives = 0, prochaine_tentative = ? WHERE statut = 'morte'"
+        parametres = [time.time()]
+        if id is not None:
+            requete += " AND id = ?"
+            parametres.append(id)
+        with self._verrou:
+            nombre = self._connexion.execute(requete, parametres).rowcount
+            self._connexion.commit()
+        return nombre
+
+
+# Objets dans lesquels un filtre sans chemin explicite est aussi recherché
+SOUS_OBJETS_FILTRES = ("personnage", "score")
+_ABSENT = object()
+
+
+# Fonction pour lire une valeur du payload à partir d'un chemin ("equipe" ou "score.equipe")
+def _lire_chemin(payload, parties):
+    valeur = payload
+    for partie in parties:
+        if not isinstance(valeur, dict) or partie not in valeur:
+            return _ABSENT
+        valeur = valeur[partie]
+    return valeur
+
+
+# Fonction pour compiler les filtres d'un abonnement en un prédicat sur le payload.
+# {"equipe": "Nankatsu SC"} : égalité ; {"position": ["attaquant", "milieu"]} : appartenance.
+# Un champ sans chemin est cherché dans le payload puis dans payload["personnage"] et payload["score"].
+def compiler_filtres(filtres):
+    if not filtres:
+        return None
+    conditions = []
+    for chemin, attendu in filtres.items():
+        parties = tuple(chemin.split("."))
+        if len(parties) == 1:
+            chemins = (parties,) + tuple((objet,) + parties for objet in SOUS_OBJETS_FILTRES)
+        else:
+            chemins = (parties,)
+        valeurs_acceptees = attendu if isinstance(attendu, list) else [attendu]
+        try:
+            valeurs_acceptees = set(valeurs_acceptees)
+        except TypeError:
+            # Valeurs non hachables (listes, dictionnaires) : gardées en liste, comparées une à une
+            pass
+        conditions.append((chemins, valeurs_acceptees))
+
+    def predicat(payload):
+        for chemins, valeurs_acceptees in conditions:
+            for parties in chemins:
+                valeur = _lire_chemin(payload, parties)
+                if valeur is not _ABSENT:
+                    break
+            if valeur is _ABSENT or not _accepte(valeur, valeurs_acceptees):
+                return False
+        return True
+
+    return predicat
+
+
+def _accepte(valeur, valeurs_acceptees):
+    try:
+        return valeur in valeurs_acceptees
+    except TypeError:
+        # Valeur non hachable (liste, dictionnaire) : comparaison une à une
+        return any(valeur == acceptee for acceptee in valeurs_acceptees)
+
+
+# Fonction pour retrouver l'ID du personnage concerné par un événement (ou None)
+def personnage_concerne(evenement):
+    payload = evenement.get("payload")
+    if not isinstance(payload, dict):
+        return None
+    if isinstance(payload.get("score"), dict):
+        return payload["score"].get("personnage_id")
+    if evenement.get("event_type") == "nouveau_personnage":
+        return payload.get("id")
+    return None
+
+
+# Fonction pour construire le corps d'une livraison groupée.
+# Avec fusion, les événements successifs d'un même personnage sont réduits au plus récent
+# (une création suivie de mises à jour reste une création, avec les dernières données).
+def construire_lot(evenements, fusionner=True):
+    if fusionner:
+        fusionnes = {}
+        for position, evenement in enumerate(evenements):
+            personnage_id = personnage_concerne(evenement)
+            if personnage_id is None:
+                fusionnes[("position", position)] = evenement
+                continue
+            famille = "score" if evenement["event_type"].endswith("_score") else evenement["event_type"]
+            cle = (famille, personnage_id)
+            precedent = fusionnes.pop(cle, None)
+            if precedent is not None and precedent["event_type"] == "nouveau_score":
+                evenement = dict(evenement, event_type="nouveau_score")
+            fusionnes[cle] = evenement
+        evenements_lot = list(fusionnes.values())
+    else:
+        evenements_lot = evenements
+    return {
+        "event_type": "lot",
+        "timestamp": datetime.now().isoformat(),
+        "nombre_evenements": len(evenements),
+        "evenements": evenements_lot
+    }
+
+
+class Disjoncteur:
+    """
+    Coupe temporairement les livraisons vers un abonné après plusieurs échecs consécutifs
+    """
+
+    def __init__(self, seuil=WEBHOOKS_SEUIL_DISJONCTEUR, duree=WEBHOOKS_DUREE_DISJONCTEUR):
+        self.seuil = seuil
+        self.duree = duree
+        self.echecs = 0
+        self.ouvert_jusqua = 0.0
+
+    def est_ouvert(self):
+        return time.time() < self.ouvert_jusqua
+
+    def succes(self):
+        self.echecs = 0
+        self.ouvert_jusqua = 0.0
+
+    def echec(self):
+        self.echecs += 1
+        if self.echecs >= self.seuil:
+            self.ouvert_jusqua = time.time() + self.duree
+
+
+class DiffuseurWebhooks:
+    """
+    Envoie les événements aux webhooks abonnés.
+    Chaque événement est d'abord ajouté à une file persistante, puis livré
+    au moins une fois par un pool de threads dédié, sur une session HTTP partagée
+    (connexions réutilisées), avec un nombre limité de livraisons simultanées par hôte :
+    les livraisons d'un hôte saturé restent en file, sans occuper de thread, si bien
+    qu'un hôte lent ne retarde pas les autres.
+    Les échecs sont retentés avec un backoff exponentiel ; après WEBHOOKS_MAX_TENTATIVES
+    la livraison est placée dans la liste des livraisons mortes.
+    Les abonnés configurés avec un "lot" reçoivent leurs événements regroupés
+    (au plus lot.taille_max événements, après au plus lot.attente_max secondes).
+    Les abonnés sont gardés en mémoire, indexés par type d'événement (avec leur filtre
+    précompilé), et mis à jour par le dépôt des webhooks : le coût d'un événement
+    ne dépend que du nombre d'abonnés concernés.
+    """
+
+    def __init__(self, chemin_file, nombre_threads=WEBHOOKS_THREADS, max_par_hote=WEBHOOKS_MAX_PAR_HOTE):
+        self.nombre_threads = nombre_threads
+        self.max_par_hote = max_par_hote
+        self.file = FileLivraisons(chemin_file)
+        self._executeur = None
+        self._session = requests.Session()
+        adaptateur = requests.adapters.HTTPAdapter(pool_connections=nombre_threads, pool_maxsize=max_par_hote)
+        self._session.mount("http://", adaptateur)
+        self._session.mount("https://", adaptateur)
+        self._disjoncteurs = {}
+        self._abonnes = {}
+        # Index de routage : type d'événement -> {url: (webhook, prédicat de filtre ou None)}
+        self._par_evenement = {}
+        self._verrou = threading.Lock()
+        # Nombre de livraisons confiées au pool de threads et pas encore terminées (au total et par hôte)
+        self._en_vol = 0
+        self._en_vol_par_hote = {}
+        self._reveil = threading.Event()
+        self._arret = threading.Event()
+        self._thread = None
+
+    # Abonnement au dépôt des webhooks
+    def webhook_modifie(self, ancien, nouveau):
+        with self._verrou:
+            if ancien is not None:
+                self._abonnes.pop(ancien["url"], None)
+                for event_type in ancien["events"]:
+                    abonnes = self._par_evenement.get(event_type)
+                    if abonnes is not None:
+                        abonnes.pop(ancien["url"], None)
+                        if not abonnes:
+                            del self._par_evenement[event_type]
+            if nouveau is not None:
+                predicat = compiler_filtres(nouveau.get("filtres"))
+                self._abonnes[nouveau["url"]] = nouveau
+                for event_type in nouveau["events"]:
+                    self._par_evenement.setdefault(event_type, {})[nouveau["url"]] = (nouveau, predicat)
+
+    def diffuser(self, event_type, payload):
+        """
+        Ajoute l'événement à la file de livraison de chaque webhook abonné
+        """
+        corps = {
+            "event_type": event_type,
+            "timestamp": datetime.now().isoformat(),
+            "payload": payload
+        }
+        with self._verrou:
+            candidats = list(self._par_evenement.get(event_type, {}).values())
+        abonnes = [webhook for webhook, predicat in candidats if predicat is None or predicat(payload)]
+        directs = [(webhook["url"], corps) for webhook in abonnes if not webhook.get("lot")]
+        groupes = [(webhook["url"], corps) for webhook in abonnes if webhook.get("lot")]
+        if directs:
+            self.file.ajouter(directs)
+        if groupes:
+            self.file.ajouter(groupes, statut="a_grouper")
+        if abonnes:
+            self._reveil.set()
+
+    def _grouper(self):
+        """
+        Regroupe les événements des abonnés en mode lot dont le lot est plein ou a assez attendu.
+        Retourne le délai avant la prochaine échéance d'un lot (ou None).
+        """
+        prochaine = None
+        maintenant = time.time()
+        for url, (nombre, plus_ancien) in self.file.groupes_en_attente().items():
+            with self._verrou:
+                # Sans configuration (abonné supprimé entre-temps), le lot est envoyé tout de suite
+                lot = (self._abonnes.get(url) or {}).get("lot") or {"taille_max": nombre, "attente_max": 0}
+            taille_max = lot.get("taille_max") or nombre
+            echeance = plus_ancien + (lot.get("attente_max") or 0)
+            if nombre >= taille_max or echeance <= maintenant:
+                self.file.grouper(url, taille_max, lambda evenements: construire_lot(evenements, lot.get("fusionner", True)))
+                # Il peut rester des événements pour un lot suivant
+                prochaine = 0.0
+            else:
+                attente = echeance - maintenant
+                prochaine = attente if prochaine is None else min(prochaine, attente)
+        return prochaine
+
+    def _urls_exclues(self):
+        """
+        URLs à ne pas réserver : abonnés coupés par leur disjoncteur, et abonnés
+        dont l'hôte a déjà max_par_hote livraisons en cours
+        """
+        with self._verrou:
+            hotes_satures = {hote for hote, nombre in self._en_vol_par_hote.items() if nombre >= self.max_par_hote}
+            urls = [
+                url for url, disjoncteur in self._disjoncteurs.items()
+                if disjoncteur.est_ouvert() or urlsplit(url).netloc in hotes_satures
+            ]
+            urls.extend(url for url in self._abonnes if urlsplit(url).netloc in hotes_satures)
+        return list(dict.fromkeys(urls))
+
+    def _limiteur_hotes(self):
+        """
+        Fonction acceptant une URL tant que son hôte a encore des places
+        (compte les livraisons en cours et celles déjà acceptées pour cette réservation)
+        """
+        with self._verrou:
+            en_vol = dict(self._en_vol_par_hote)
+
+        def accepter(url):
+            hote = urlsplit(url).netloc
+            if en_vol.get(hote, 0) >= self.max_par_hote:
+                return False
+            en_vol[hote] = en_vol.get(hote, 0) + 1
+            return True
+
+        return accepter
+
+    def _disjoncteur(self, url):
+        with self._verrou:
+            disjoncteur = self._disjoncteurs.get(url)
+            if disjoncteur is None:
+                disjoncteur = self._disjoncteurs[url] = Disjoncteur()
+        return disjoncteur
+
+    def circuits_ouverts(self):
+        """
+        URLs des abonnés temporairement coupés
+        """
+        with self._verrou:
+            return [url for url, disjoncteur in self._disjoncteurs.items() if disjoncteur.est_ouvert()]
+
+    def _livrer(self, livraison):
+        url = livraison["url"]
+        disjoncteur = self._disjoncteur(url)
+        try:
+            # Envoyer la requête au webhook
+            reponse = self._session.post(
+                url,
+                json=livraison["corps"],
+                headers={"Content-Type": "application/json"},
+                timeout=WEBHOOKS_TIMEOUT
+            )
+            reponse.raise_for_status()
+        except Exception as e:
+            disjoncteur.echec()
+            tentatives = livraison["tentatives"] + 1
+            if tentatives >= WEBHOOKS_MAX_TENTATIVES:
+                print(f"Livraison abandonnée pour le webhook {url} après {tentatives} tentatives: {str(e)}")
+                self.file.enterrer(livraison["id"], tentatives, str(e))
+            else:
+                # Backoff exponentiel avec jitter
+                delai = random.uniform(0, min(WEBHOOKS_BACKOFF_MAX, WEBHOOKS_BACKOFF_BASE * (2 ** tentatives)))
+                self.file.reporter(livraison["id"], tentatives, time.time() + delai, str(e))
+        else:
+            disjoncteur.succes()
+            self.file.terminer(livraison["id"])
+        finally:
+            hote = urlsplit(url).netloc
+            with self._verrou:
+                self._en_vol -= 1
+                self._en_vol_par_hote[hote] -= 1
+                if not self._en_vol_par_hote[hote]:
+                    del self._en_vol_par_hote[hote]
+            self._reveil.set()
+
+    def _boucle(self):
+        # Aucune livraison n'attend un thread libre : elle serait réservée sans être envoyée
+        capacite = self.nombre_threads
+        while not self._arret.is_set():
+            # Effacer le réveil avant de lire la file : un événement ajouté pendant la lecture
+            # le repositionne et n'attend pas la prochaine échéance
+            self._reveil.clear()
+            with self._verrou:
+                places = capacite - self._en_vol
+            livraisons = []
+            try:
+                prochain_lot = self._grouper()
+            except sqlite3.Error as e:
+                prochain_lot = None
+                print(f"Erreur lors du regroupement des webhooks: {str(e)}")
+            # Les abonnés coupés par leur disjoncteur sont ignorés jusqu'à la fin de la coupure,
+            # et les hôtes saturés jusqu'à la fin d'une de leurs livraisons
+            urls_exclues = self._urls_exclues()
+            if places > 0:
+                try:
+                    livraisons = self.file.reserver(places, urls_exclues, self._limiteur_hotes())
+                except sqlite3.Error as e:
+                    print(f"Erreur lors de la lecture de la file des webhooks: {str(e)}")
+            for livraison in livraisons:
+                hote = urlsplit(livraison["url"]).netloc
+                with self._verrou:
+                    self._en_vol += 1
+                    self._en_vol_par_hote[hote] = self._en_vol_par_hote.get(hote, 0) + 1
+                self._executeur.submit(self._livrer, livraison)
+            if not livraisons:
+                # Attendre un nouvel événement, une fin de livraison ou la prochaine échéance
+                # (les livraisons des abonnés exclus attendent la fin d'une livraison, qui réveille la boucle)
+                echeance = self.file.prochaine_echeance(urls_exclues)
+                attente = 1.0 if echeance is None else min(1.0, max(0.05, echeance - time.time()))
+                if prochain_lot is not None:
+                    attente = min(attente, max(0.05, prochain_lot))
+                self._reveil.wait(attente)
+
+    def demarrer(self):
+        """
+        Démarre la livraison des événements en attente
+        """
+        if self._thread is not None:
+            return
+        self._arret.clear()
+        self._executeur = ThreadPoolExecutor(max_workers=self.nombre_threads, thread_name_prefix="webhook")
+        self._thread = threading.Thread(target=self._boucle, name="webhooks", daemon=True)
+        self._thread.start()
+
+    def arreter(self):
+        """
+        Attend la fin des livraisons en cours ; les livraisons restantes sont
+        conservées dans la file et reprises au prochain démarrage
+        """
+        if self._thread is not None:
+            self._arret.set()
+            self._reveil.set()
+            self._thread.join()
+            self._thread = None
+            self._executeur.shutdown(wait=True)
+            self._executeur = None
+        self._session.close()
+
+
+def verifier_isolation_hotes(evenements_lents=40, latence=2.0):
+    """
+    Un hôte lent (saturé par `evenements_lents` livraisons de `latence` secondes)
+    ne doit pas retarder la livraison d'un événement à un autre hôte
+    """
+    import tempfile
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    # Port -> heures de réception ; nombre de requêtes simultanées reçues par l'hôte lent
+    recus = {}
+    simultanees = {"en_cours": 0, "max": 0}
+    verrou = threading.Lock()
+
+    def serveur(attente):
+        class Gestionnaire(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                lent = self.server.server_port == ports["lent"]
+                with verrou:
+                    simultanees["en_cours"] += lent
+                    simultanees["max"] = max(simultanees["max"], simultanees["en_cours"])
+                time.sleep(attente)
+                with verrou:
+                    simultanees["en_cours"] -= lent
+                    recus.setdefault(self.server.server_port, []).append(time.time())
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        serveur = ThreadingHTTPServer(("127.0.0.1", 0), Gestionnaire)
+        threading.Thread(target=serveur.serve_forever, daemon=True).start()
+        return serveur
+
+    ports = {}
+    lent, rapide = serveur(latence), serveur(0)
+    ports["lent"] = lent.server_port
+    url_lente = f"http://127.0.0.1:{lent.server_port}/hook"
+    url_rapide = f"http://127.0.0.1:{rapide.server_port}/hook"
+    with tempfile.TemporaryDirectory() as dossier:
+        diffuseur = DiffuseurWebhooks(os.path.join(dossier, "file.db"))
+        diffuseur.webhook_modifie(None, {"url": url_lente, "events": ["lent"]})
+        diffuseur.webhook_modifie(None, {"url": url_rapide, "events": ["rapide"]})
+        for numero in range(evenements_lents):
+            diffuseur.diffuser("lent", {"numero": numero})
+        debut = time.time()
+        diffuseur.diffuser("rapide", {})
+        diffuseur.demarrer()
+        while rapide.server_port not in recus and time.time() - debut < 2 * latence:
+            time.sleep(0.01)
+        delai = recus[rapide.server_port][0] - debut if rapide.server_port in recus else None
+        # Laisser passer quelques vagues de livraisons lentes
+        time.sleep(latence * 2.5)
+        diffuseur.arreter()
+        lent.shutdown()
+        rapide.shutdown()
+
+    assert delai is not None and delai < latence / 2, f"événement de l'hôte rapide livré après {delai} s"
+    assert simultanees["max"] <= diffuseur.max_par_hote, f"{simultanees['max']} livraisons simultanées vers l'hôte lent"
+    assert len(recus.get(lent.server_port, [])) >= diffuseur.max_par_hote, "aucune livraison vers l'hôte lent"
+    print(f"✅ Hôte rapide servi en {delai * 1000:.0f} ms pendant la saturation de l'hôte lent "
+          f"({len(recus[lent.server_port])} livraisons lentes, au plus {simultanees['max']} simultanées)")
+
+
+if __name__ == "__main__":
+    verifier_isolation_hotes()